@@ -0,0 +1,31 @@
+#Hinsley Casenet - U59220930
+#hw/database.py - sqlite settings for many readers next to long simulation writes
+
+#applied to every new connection. wal lets pages read while a season is written, synchronous=normal is
+#safe with wal and skips an fsync per commit, the rest keeps temporary tables and more pages in memory
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -32000,  #negative is in KiB, 32 MB
+    'mmap_size': 128 * 1024 * 1024,
+}
+
+
+def sqlite_database(name, busy_timeout, conn_max_age):
+    '''DATABASES entry of a sqlite file - busy_timeout is how long (in seconds) a connection waits for the
+    write lock before "database is locked", conn_max_age how long a connection is kept between requests'''
+
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': busy_timeout,
+            #transactions take the write lock when they begin, so a writer waits for its turn up front
+            #instead of failing when a read inside its transaction turns into a write
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {pragma}={value}' for pragma, value in SQLITE_PRAGMAS.items()),
+        },
+    }
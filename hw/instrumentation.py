@@ -0,0 +1,139 @@
+#Hinsley Casenet - U59220930
+#hw/instrumentation.py - opt-in per request sql and timing instrumentation, turned on with REQUEST_TIMING
+
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import JsonResponse
+
+logger = logging.getLogger('hw.requests')
+
+#recent slow requests of this process, newest last - shown to staff by slow_requests
+slow_request_log = deque(maxlen=settings.REQUEST_TIMING_BUFFER_SIZE)
+slow_request_lock = threading.Lock()
+
+
+class QueryRecorder:
+    '''execute wrapper that counts and times every statement run on a connection'''
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []  #(seconds, sql) of every statement
+        self.shapes = Counter()  #how often each sql text ran, the params are not part of the text
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            self.statements.append((elapsed, sql))
+            self.shapes[sql] += 1
+
+    def slowest(self, limit):
+        '''the slowest statements, as (ms, sql) pairs'''
+
+        return [
+            {'ms': round(elapsed * 1000, 2), 'sql': sql[:500]}
+            for elapsed, sql in sorted(self.statements, key=lambda statement: statement[0], reverse=True)[:limit]
+        ]
+
+    def repeated(self, limit):
+        '''statements that ran more than once - a statement repeated once per row is an n+1'''
+
+        return [{'count': count, 'sql': sql[:500]} for sql, count in self.shapes.most_common(limit) if count > 1]
+
+
+class RequestTimingMiddleware:
+    '''records the query count, db time, slowest and repeated statements and view time of every request,
+    sends them back as Server-Timing headers and a json log line, and keeps a sample of the slow
+    requests for the staff page'''
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        return self.report(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        #the async orm runs its queries in the sync thread of the request, the recorder has to be put on
+        #the connection of that thread
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        await sync_to_async(lambda: connection.execute_wrappers.append(recorder))()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(lambda: connection.execute_wrappers.remove(recorder))()
+        return self.report(request, response, recorder, started)
+
+    def report(self, request, response, recorder, started):
+        '''adds the timing headers to the response, logs it and keeps it when it was slow'''
+
+        total_ms = (time.perf_counter() - started) * 1000
+        db_ms = recorder.seconds * 1000
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db_ms:.1f};desc="{recorder.count} queries"',
+            f'view;dur={total_ms - db_ms:.1f}',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+        entry = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'db_ms': round(db_ms, 1),
+            'queries': recorder.count,
+            'slowest': recorder.slowest(settings.REQUEST_TIMING_SLOWEST),
+            'repeated': recorder.repeated(settings.REQUEST_TIMING_SLOWEST),
+        }
+        logger.info(json.dumps(entry))
+
+        if total_ms >= settings.REQUEST_TIMING_SLOW_MS and random.random() < settings.REQUEST_TIMING_SAMPLE_RATE:
+            entry['time'] = time.time()
+            with slow_request_lock:
+                slow_request_log.append(entry)
+
+        return response
+
+
+@staff_member_required
+def slow_requests(request):
+    '''the sampled slow requests of this process, slowest first'''
+
+    with slow_request_lock:
+        entries = list(slow_request_log)
+
+    return JsonResponse({
+        'enabled': settings.REQUEST_TIMING,
+        'slow_ms': settings.REQUEST_TIMING_SLOW_MS,
+        'requests': sorted(entries, key=lambda entry: entry['total_ms'], reverse=True),
+    })
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os #operating system library
 from pathlib import Path
 
+from .database import sqlite_database
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -43,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'hw.instrumentation.RequestTimingMiddleware',  #first so it sees every query, off unless REQUEST_TIMING is set
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,7 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'hw.middleware.AsyncWhiteNoiseMiddleware',  #whitenoise, without making the async views run in a thread
 ]
 
 ROOT_URLCONF = 'hw.urls'
@@ -80,13 +84,24 @@ WSGI_APPLICATION = 'hw.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+#sqlite in wal mode - SQLITE_PATH moves the file, SQLITE_BUSY_TIMEOUT is how long (in seconds) a writer
+#waits for the lock and DB_CONN_MAX_AGE how long (in seconds) a connection is reused, see hw/database.py.
+#connections are closed after every request by default - the web runs under asgi, where the async views
+#reach the db from a different thread each time and a kept connection is never picked up again. single
+#threaded processes (the simulation workers, wsgi) may set DB_CONN_MAX_AGE to keep theirs
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': sqlite_database(
+        os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        busy_timeout=float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+    ),
 }
 
+#writes that still hit a locked database are run again, this many times in all, after a random wait that
+#grows from DB_LOCK_RETRY_WAIT seconds (see project/concurrency.py)
+DB_LOCK_RETRIES = int(os.environ.get('DB_LOCK_RETRIES', 5))
+DB_LOCK_RETRY_WAIT = float(os.environ.get('DB_LOCK_RETRY_WAIT', 0.1))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -123,7 +138,6 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
 STATIC_URL = '/static/'
-import os #operating system library
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles') #we will have a root for all static directories, for all static resources - it will hang off the base directory and be called 'staticfiles' ##
 STATICFILES_DIR = [
     os.path.join(BASE_DIR, "static")
@@ -143,3 +157,61 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = 'login'
+
+#background simulations - number of worker processes started by `manage.py run_simulation_worker`
+#and how often (in seconds) an idle worker checks the queue
+SIMULATION_WORKERS = int(os.environ.get('SIMULATION_WORKERS', 2))
+SIMULATION_POLL_INTERVAL = float(os.environ.get('SIMULATION_POLL_INTERVAL', 1.0))
+
+#league locks - how long (in seconds) a simulation may hold its league before another run may take the lock
+#over, and how often a run that waits for the lock checks it again
+SIMULATION_LOCK_TIMEOUT = float(os.environ.get('SIMULATION_LOCK_TIMEOUT', 600))
+SIMULATION_LOCK_POLL_INTERVAL = float(os.environ.get('SIMULATION_LOCK_POLL_INTERVAL', 0.2))
+
+#job status long polls - the longest (in seconds) a status request waits for the job to move, and how
+#often it checks the job meanwhile
+JOB_STATUS_MAX_WAIT = float(os.environ.get('JOB_STATUS_MAX_WAIT', 25.0))
+JOB_STATUS_POLL_INTERVAL = float(os.environ.get('JOB_STATUS_POLL_INTERVAL', 0.5))
+
+#season projections - default number of simulated seasons, the most a user can ask for, how many
+#processes share the work and how long (in seconds) a projection is cached while the rosters are unchanged.
+#every worker can hold about 50 MB while it simulates (see projections.BLOCK_ELEMENTS), so by default
+#no more than 4 of them run next to the web process
+PROJECTION_TRIALS = int(os.environ.get('PROJECTION_TRIALS', 2000))
+PROJECTION_MAX_TRIALS = int(os.environ.get('PROJECTION_MAX_TRIALS', 20000))
+PROJECTION_WORKERS = int(os.environ.get('PROJECTION_WORKERS', min(4, os.cpu_count() or 1)))
+PROJECTION_CACHE_TIMEOUT = 60 * 60
+
+#local cache, no external service needed - cached pages and stats are keyed by the league's data version,
+#so every process sees a change as soon as the version in the db is bumped
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'league-simulator',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 5000))},
+    }
+}
+
+#how long (in seconds) an unused entry is kept - entries never go stale, the timeouts only bound memory
+STATS_CACHE_TIMEOUT = 24 * 60 * 60
+PAGE_CACHE_TIMEOUT = 24 * 60 * 60
+
+#request instrumentation - when REQUEST_TIMING is set every response gets Server-Timing headers and a json
+#line on the hw.requests logger, requests slower than REQUEST_TIMING_SLOW_MS are sampled into a buffer that
+#staff can see at /debug/slow-requests/
+REQUEST_TIMING = os.environ.get('REQUEST_TIMING', '').lower() in ('1', 'true', 'yes')
+REQUEST_TIMING_SLOW_MS = float(os.environ.get('REQUEST_TIMING_SLOW_MS', 500))
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE', 1.0))
+REQUEST_TIMING_BUFFER_SIZE = int(os.environ.get('REQUEST_TIMING_BUFFER_SIZE', 100))
+REQUEST_TIMING_SLOWEST = 5  #number of slowest and most repeated statements kept per request
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'hw.requests': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -19,9 +19,11 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from .instrumentation import slow_requests
 
 urlpatterns = [
    path("admin/", admin.site.urls),
+   path("debug/slow-requests/", slow_requests, name="slow_requests"),
    path("", include("project.urls")),
 
 ] + static(settings.STATIC_URL,
@@ -6,8 +6,64 @@ from django.contrib import admin
 # Register your models here.
 
 
-from .models import Player, Team, League, Game
+from .models import Player, Team, League, Game, SimulationJob, Standing, LeagueLock
+from .standings import rebuild_standings
+
+
+class GameAdmin(admin.ModelAdmin):
+    '''games edited by hand recount the standings of their league so the two never disagree - the winner
+    and whether the game was played follow from the points'''
+
+    readonly_fields = ['winner', 'played']
+
+    def save_model(self, request, obj, form, change):
+        #same rules as the standings - a game without points is still to be played and the home team only
+        #wins with more points
+        obj.played = bool(obj.points_scored_team1 or obj.points_scored_team2)
+        if not obj.played:
+            obj.winner = None
+        elif obj.points_scored_team1 > obj.points_scored_team2:
+            obj.winner = obj.team1
+        else:
+            obj.winner = obj.team2
+
+        super().save_model(request, obj, form, change)
+        rebuild_standings(obj.team1.league)
+
+    def delete_model(self, request, obj):
+        league = obj.team1.league
+        super().delete_model(request, obj)
+        rebuild_standings(league)
+
+    def delete_queryset(self, request, queryset):
+        leagues = set(League.objects.filter(games__in=queryset))
+        super().delete_queryset(request, queryset)
+        for league in leagues:
+            rebuild_standings(league)
+
+
+class TeamAdmin(admin.ModelAdmin):
+    '''the record and place of a team are copied from its standings row'''
+
+    readonly_fields = ['wins', 'losses', 'place_in_standings']
+
+
+class StandingAdmin(admin.ModelAdmin):
+    '''standings are counted from the games, they can be looked at but not edited'''
+
+    list_display = ['team', 'league', 'place', 'wins', 'losses', 'games_back', 'streak']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 admin.site.register(Player)
-admin.site.register(Team)
+admin.site.register(Team, TeamAdmin)
 admin.site.register(League)
-admin.site.register(Game)
+admin.site.register(Game, GameAdmin)
+admin.site.register(SimulationJob)
+admin.site.register(LeagueLock)
+admin.site.register(Standing, StandingAdmin)
@@ -0,0 +1,146 @@
+#Hinsley Casenet - U59220930
+#project/api.py - read only json api (v1) for leagues, standings, games, team schedules and rosters. every
+#response carries an ETag and Last-Modified taken from the league's data version, so polling clients get a
+#304 for one query on the league until its games, teams or players change. the views are async and read
+#with the async orm
+
+from calendar import timegm
+from functools import wraps
+
+from django.db.models import Count, Q
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .exports import standing_row, standing_values
+from .models import Game, League, Team
+from .pagination import agames_page
+
+API_VERSION = 'v1'
+
+
+def api_error(message, status):
+    '''json body of a failed api request'''
+
+    return JsonResponse({'error': message}, status=status)
+
+
+def league_view(view):
+    '''wraps an api view of one league - checks the login, loads the league and answers conditional
+    requests with a 304 before the view runs. the view gets the league and returns the data to send'''
+
+    @wraps(view)
+    async def wrapper(request, pk, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return api_error('Authentication required.', 401)
+
+        league = await League.objects.filter(pk=pk).afirst()
+        if league is None:
+            return api_error('League not found.', 404)
+
+        etag = quote_etag(f'{API_VERSION}-{league.pk}-{league.data_version}')
+        last_modified = timegm(league.data_updated_at.utctimetuple())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            try:
+                data = await view(request, league, *args, **kwargs)
+            except Http404:
+                return api_error('Not found.', 404)
+            response = data if isinstance(data, JsonResponse) else JsonResponse(data)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        #clients may keep the response but have to check it is still current before using it
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return wrapper
+
+
+def team_data(team_id, city, name):
+    '''short json form of a team'''
+
+    return {'id': team_id, 'name': f'{city} {name}'}
+
+
+def game_data(game):
+    '''json form of a game, the teams have to be selected with it'''
+
+    return {
+        'id': game.pk,
+        'date': game.date.isoformat(),
+        'home': team_data(game.team1_id, game.team1.city, game.team1.name),
+        'away': team_data(game.team2_id, game.team2.city, game.team2.name),
+        'home_points': game.points_scored_team1 if game.played else None,
+        'away_points': game.points_scored_team2 if game.played else None,
+        'winner_id': game.winner_id,
+        'played': game.played,
+    }
+
+
+@league_view
+async def league_summary(request, league):
+    '''the league and how far its season is'''
+
+    games = await Game.objects.filter(league=league).aaggregate(total=Count('id'), played=Count('id', filter=Q(played=True)))
+    return {
+        'id': league.pk,
+        'name': league.name,
+        'season': league.season,
+        'num_teams': league.num_teams,
+        'num_games': league.num_games,
+        'games_scheduled': games['total'],
+        'games_played': games['played'],
+        'data_version': league.data_version,
+        'updated_at': league.data_updated_at.isoformat(),
+    }
+
+
+@league_view
+async def league_standings(request, league):
+    '''the standings in order of place'''
+
+    return {'standings': [standing_row(values) async for values in standing_values(league)]}
+
+
+@league_view
+async def league_games(request, league):
+    '''one page of the games, newest first - ?after=<cursor> gives the next page, ?team=<id> keeps the
+    games of one team'''
+
+    games = Game.objects.filter(league=league).select_related('team1', 'team2')
+    team_id = request.GET.get('team')
+    if team_id:
+        if not team_id.isdigit():
+            return api_error('Invalid team.', 400)
+        games = games.filter(Q(team1_id=team_id) | Q(team2_id=team_id))
+
+    try:
+        page, next_cursor = await agames_page(games, request.GET.get('after'))
+    except ValueError:
+        return api_error('Invalid cursor.', 400)
+
+    return {'games': [game_data(game) for game in page], 'next': next_cursor}
+
+
+@league_view
+async def team_schedule(request, league, team_pk):
+    '''every game of a team in date order'''
+
+    team = await aget_object_or_404(Team, pk=team_pk, league=league)
+    games = team.team_schedule().select_related('team1', 'team2').order_by('date', 'id')
+    return {'team': team_data(team.pk, team.city, team.name), 'games': [game_data(game) async for game in games]}
+
+
+@league_view
+async def team_roster(request, league, team_pk):
+    '''the players of a team'''
+
+    team = await aget_object_or_404(Team, pk=team_pk, league=league)
+    players = team.roster().order_by('id').values('id', 'first_name', 'last_name', 'position', 'star', 'dob')
+    return {'team': team_data(team.pk, team.city, team.name), 'players': [player async for player in players]}
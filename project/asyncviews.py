@@ -0,0 +1,98 @@
+#Hinsley Casenet - U59220930
+#project/asyncviews.py - base classes of the async read views. they load their data with the async orm, so
+#under asgi a request waiting on the database or the cache does not hold a thread
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.shortcuts import aget_object_or_404
+from django.template.loader import render_to_string
+from django.template.response import TemplateResponse
+from django.utils.safestring import mark_safe
+from django.views import View
+
+from .caching import league_cache_key
+
+
+class AsyncLoginRequiredMixin:
+    '''LoginRequiredMixin for views with async handlers - the user is loaded with the async auth api'''
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        #the page templates read request.user, this way they do not load the user a second time
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncTemplateView(AsyncLoginRequiredMixin, View):
+    '''renders template_name with the context of aget_context_data - the template is rendered after the
+    view returns, in a thread, so it may still touch lazy relations'''
+
+    template_name = None
+
+    async def aget_context_data(self, **kwargs):
+        '''context of the page'''
+
+        return {'view': self, **kwargs}
+
+    async def get(self, request, *args, **kwargs):
+        return TemplateResponse(request, self.template_name, await self.aget_context_data(**kwargs))
+
+
+class AsyncLeagueFragmentView(AsyncTemplateView):
+    '''async version of caching.LeagueFragmentMixin - the object comes from aget_object and the part of
+    the page that only depends on the league's data is served from the cache until its data version
+    changes. the fragment context has to be loaded completely (lists, selected relations), it is rendered
+    outside of the request thread'''
+
+    model = None
+    fragment_template = None
+    context_object_name = 'object'
+
+    def get_queryset(self):
+        '''objects the page may show, like SingleObjectMixin.get_queryset'''
+
+        return self.model._default_manager.all()
+
+    async def aget_object(self):
+        '''object of the page, raises Http404 when it does not exist'''
+
+        return await aget_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
+
+    def get_league(self):
+        '''league the fragment belongs to'''
+
+        return self.object
+
+    def get_fragment_key_parts(self):
+        '''request parameters the fragment depends on'''
+
+        return []
+
+    async def aget_fragment_context(self, context):
+        '''context of the fragment, only built when it is not cached'''
+
+        return context
+
+    async def aget_context_data(self, **kwargs):
+        context = await super().aget_context_data(**kwargs)
+        context['object'] = context[self.context_object_name] = self.object
+
+        key = league_cache_key(self.get_league(), self.fragment_template, *self.get_fragment_key_parts())
+        fragment = await cache.aget(key)
+        if fragment is None:
+            fragment_context = await self.aget_fragment_context(dict(context))
+            fragment = await sync_to_async(render_to_string)(self.fragment_template, fragment_context)
+            await cache.aset(key, fragment, settings.PAGE_CACHE_TIMEOUT)
+
+        context['fragment'] = mark_safe(fragment)
+        return context
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        return await super().get(request, *args, **kwargs)
+
@@ -0,0 +1,49 @@
+#Hinsley Casenet - U59220930
+#project/caching.py - per league cache of rendered page fragments, keyed by the league's data version
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+def league_cache_key(league, *parts):
+    '''cache key of something derived from the league's data - the data version is part of the key, so
+    bumping it retires every entry of the league at once'''
+
+    return ':'.join(['league', str(league.pk), str(league.data_version)] + [str(part) for part in parts])
+
+
+class LeagueFragmentMixin:
+    '''renders the part of a page that only depends on the league's data once per data version and serves
+    it from the cache until the league is simulated or edited - everything that depends on the user
+    (csrf tokens, owner links, messages) stays in the page around the fragment'''
+
+    fragment_template = None
+
+    def get_league(self):
+        '''league the fragment belongs to'''
+
+        return self.object
+
+    def get_fragment_key_parts(self):
+        '''request parameters the fragment depends on'''
+
+        return []
+
+    def get_fragment_context(self, context):
+        '''context of the fragment, only built when it is not cached'''
+
+        return context
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        key = league_cache_key(self.get_league(), self.fragment_template, *self.get_fragment_key_parts())
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = render_to_string(self.fragment_template, self.get_fragment_context(context))
+            cache.set(key, fragment, settings.PAGE_CACHE_TIMEOUT)
+
+        context['fragment'] = mark_safe(fragment)
+        return context
@@ -0,0 +1,118 @@
+#Hinsley Casenet - U59220930
+#project/concurrency.py - keeps concurrent writers from failing on the sqlite write lock, and two
+#simulations of the same league from running at the same time
+
+import datetime
+import os
+import secrets
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+from tenacity import retry, retry_if_exception, wait_random_exponential
+
+from .simulation import SimulationError
+
+
+class LeagueBusy(SimulationError):
+    '''raised when the league is being simulated by another run'''
+
+
+def is_lock_error(error):
+    '''whether the error is sqlite giving up on the write lock'''
+
+    return isinstance(error, OperationalError) and 'locked' in str(error)
+
+
+def should_retry(error):
+    '''lock errors are retried from outside a transaction only - a statement that failed inside one cannot
+    be run again on its own, the whole transaction is retried by the caller that started it'''
+
+    return is_lock_error(error) and not connection.in_atomic_block
+
+
+def out_of_attempts(retry_state):
+    '''stops after DB_LOCK_RETRIES attempts, read when it is needed so tests can change it'''
+
+    return retry_state.attempt_number >= settings.DB_LOCK_RETRIES
+
+
+def lock_wait(retry_state):
+    '''random wait before the next attempt, growing from DB_LOCK_RETRY_WAIT seconds'''
+
+    return wait_random_exponential(multiplier=settings.DB_LOCK_RETRY_WAIT, max=5)(retry_state)
+
+
+def retry_on_lock(function):
+    '''runs function again with backoff when its write fails with "database is locked" - function has to
+    start its own transactions and leave nothing behind in memory when one is rolled back'''
+
+    return retry(retry=retry_if_exception(should_retry), stop=out_of_attempts, wait=lock_wait, reraise=True)(function)
+
+
+@retry_on_lock
+def acquire_league_lock(league, token, owner, job=None):
+    '''takes the lock of the league unless another run holds it, returns the lock that is held afterwards -
+    the check and the insert share one transaction, so two runs can never both take it'''
+
+    from .models import LeagueLock
+
+    now = timezone.now()
+    with transaction.atomic(savepoint=False):
+        LeagueLock.objects.filter(league=league, expires_at__lte=now).delete()
+        lock, _ = LeagueLock.objects.get_or_create(league=league, defaults={
+            'token': token,
+            'owner': owner,
+            'job': job,
+            'acquired_at': now,
+            'expires_at': now + datetime.timedelta(seconds=settings.SIMULATION_LOCK_TIMEOUT),
+        })
+    return lock
+
+
+@retry_on_lock
+def renew_league_lock(league, token):
+    '''moves the expiry of a held lock SIMULATION_LOCK_TIMEOUT seconds ahead, returns False when the lock is
+    no longer held (it expired and was taken over, or its job was failed as stale)'''
+
+    from .models import LeagueLock
+
+    expires_at = timezone.now() + datetime.timedelta(seconds=settings.SIMULATION_LOCK_TIMEOUT)
+    return LeagueLock.objects.filter(league=league, token=token).update(expires_at=expires_at) > 0
+
+
+@retry_on_lock
+def release_league_lock(league, token):
+    '''gives the lock back, a lock that expired and was taken over by another run is left alone - the league
+    may also be given by its pk'''
+
+    from .models import LeagueLock
+
+    LeagueLock.objects.filter(league=league, token=token).delete()
+
+
+@contextmanager
+def league_lock(league, owner=None, wait=0):
+    '''holds the simulation lock of the league for the block - waits up to wait seconds for another run to
+    finish, then raises LeagueBusy'''
+
+    token = secrets.token_hex(16)
+    owner = owner or f'process {os.getpid()}'
+    #kept for the release, the block may delete the league
+    league_pk = league.pk
+    deadline = time.monotonic() + wait
+
+    while True:
+        lock = acquire_league_lock(league, token, owner)
+        if lock.token == token:
+            break
+        if time.monotonic() >= deadline:
+            raise LeagueBusy(f"League {league} is already being simulated ({lock.owner}).")
+        time.sleep(settings.SIMULATION_LOCK_POLL_INTERVAL)
+
+    try:
+        yield lock
+    finally:
+        release_league_lock(league_pk, token)
@@ -0,0 +1,161 @@
+#Hinsley Casenet - U59220930
+#project/exports.py - streams the games, standings and rosters of a league as csv or ndjson, row by row
+
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+#rows are read from the db in chunks of this size, so memory stays flat however many games a league has
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def game_values(league):
+    '''query of every game of the league in date order'''
+
+    from .models import Game
+
+    return Game.objects.filter(league=league).order_by('date', 'id').values_list(
+        'id', 'date', 'team1_id', 'team1__city', 'team1__name', 'team2_id', 'team2__city', 'team2__name',
+        'points_scored_team1', 'points_scored_team2', 'winner_id', 'played',
+    )
+
+
+def game_row(values):
+    '''one row of game_values as a dict'''
+
+    game_id, date, home_id, home_city, home_name, away_id, away_city, away_name, home_points, away_points, winner_id, played = values
+    return {
+        'id': game_id,
+        'date': date.isoformat(),
+        'home_id': home_id,
+        'home': f'{home_city} {home_name}',
+        'away_id': away_id,
+        'away': f'{away_city} {away_name}',
+        'home_points': home_points if played else None,
+        'away_points': away_points if played else None,
+        'winner_id': winner_id,
+        'played': played,
+    }
+
+
+def standing_values(league):
+    '''query of the standings of the league in order of place'''
+
+    from .models import Standing
+
+    return Standing.objects.filter(league=league).order_by('place').values_list(
+        'place', 'team_id', 'team__city', 'team__name', 'wins', 'losses', 'win_pct', 'games_back',
+        'points_for', 'points_against', 'streak',
+    )
+
+
+def standing_row(values):
+    '''one row of standing_values as a dict'''
+
+    place, team_id, city, name, wins, losses, win_pct, games_back, points_for, points_against, streak = values
+    return {
+        'place': place,
+        'team_id': team_id,
+        'team': f'{city} {name}',
+        'wins': wins,
+        'losses': losses,
+        'win_pct': round(win_pct, 3),
+        'games_back': games_back,
+        'points_for': points_for,
+        'points_against': points_against,
+        'streak': streak,
+    }
+
+
+def player_values(league):
+    '''query of every player of the league, team by team'''
+
+    from .models import Player
+
+    return Player.objects.filter(team__league=league).order_by('team_id', 'id').values_list(
+        'id', 'team_id', 'team__city', 'team__name', 'first_name', 'last_name', 'position', 'star', 'dob',
+    )
+
+
+def player_row(values):
+    '''one row of player_values as a dict - in the columns the roster import reads back'''
+
+    player_id, team_id, city, name, first_name, last_name, position, star, dob = values
+    return {
+        'id': player_id,
+        'team_id': team_id,
+        'city': city,
+        'team_name': name,
+        'first_name': first_name,
+        'last_name': last_name,
+        'position': position,
+        'star': star,
+        'dob': dob,
+    }
+
+
+#kind of export: (column names, query of the league's rows, row as a dict)
+EXPORT_KINDS = {
+    'games': (['id', 'date', 'home_id', 'home', 'away_id', 'away', 'home_points', 'away_points', 'winner_id', 'played'], game_values, game_row),
+    'standings': (['place', 'team_id', 'team', 'wins', 'losses', 'win_pct', 'games_back', 'points_for', 'points_against', 'streak'], standing_values, standing_row),
+    'rosters': (['id', 'team_id', 'city', 'team_name', 'first_name', 'last_name', 'position', 'star', 'dob'], player_values, player_row),
+}
+
+
+class Echo:
+    '''file-like object that hands back what is written, so csv.writer can format one line at a time'''
+
+    def write(self, value):
+        return value
+
+
+async def aiterate(query):
+    '''reads a query in chunks of EXPORT_CHUNK_SIZE rows from a thread, one chunk in memory at a time -
+    QuerySet.aiterator cannot be used, it runs a values_list query on the event loop'''
+
+    rows = query.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    while chunk := await sync_to_async(list)(islice(rows, EXPORT_CHUNK_SIZE)):
+        for row in chunk:
+            yield row
+
+
+def export_line(export_format, writer, row, columns):
+    '''one line of the export'''
+
+    if export_format == 'csv':
+        return writer.writerow([row[column] for column in columns])
+    return json.dumps(row) + '\n'
+
+
+def stream_export(league, kind, export_format):
+    '''yields the export one line at a time - raises KeyError for an unknown kind or format'''
+
+    columns, values, to_row = EXPORT_KINDS[kind]
+    EXPORT_FORMATS[export_format]
+
+    writer = csv.writer(Echo())
+    if export_format == 'csv':
+        yield writer.writerow(columns)
+    for row_values in values(league).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield export_line(export_format, writer, to_row(row_values), columns)
+
+
+async def astream_export(league, kind, export_format):
+    '''stream_export for asgi - the rows are read in chunks with the async orm, an async response that
+    was handed a sync iterator would read the whole export into memory before sending it'''
+
+    columns, values, to_row = EXPORT_KINDS[kind]
+    EXPORT_FORMATS[export_format]
+
+    writer = csv.writer(Echo())
+    if export_format == 'csv':
+        yield writer.writerow(columns)
+    async for row_values in aiterate(values(league)):
+        yield export_line(export_format, writer, to_row(row_values), columns)
@@ -2,14 +2,31 @@
 #project/forms.py
 
 from django import forms
-from .models import League #model that we created
+from .models import League, generate_seed #model that we created
+from .imports import format_of
 
 class CreateLeagueForm(forms.ModelForm):
     """A form to add league to the existing database with validation."""
 
     class Meta:
         model = League
-        fields = ['name', 'logo', 'num_teams', 'num_games'] #values that should appear on form
+        fields = ['name', 'logo', 'num_teams', 'num_games', 'seed'] #values that should appear on form
+        help_texts = {'seed': 'Optional - the same seed always generates and simulates the same league.'}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        #the seed can be left blank, a random one is picked in that case
+        self.fields['seed'].required = False
+        self.fields['seed'].initial = None
+
+    def clean_seed(self):
+        seed = self.cleaned_data.get('seed')
+        if seed is None:
+            return generate_seed()
+        if seed < 0:
+            raise forms.ValidationError("The seed must be a positive number.")
+        return seed
 
     def clean(self):
         cleaned_data = super().clean()
@@ -56,3 +73,22 @@ class UpdateLeagueForm(forms.ModelForm):
         return cleaned_data
 
 
+
+
+class ImportLeagueForm(CreateLeagueForm):
+    '''A form to create a league from an uploaded roster file instead of random teams'''
+
+    roster = forms.FileField(help_text='A csv or ndjson file with one row per player: city, team_name, first_name, last_name, position, star, dob.')
+
+    class Meta(CreateLeagueForm.Meta):
+        fields = ['name', 'logo', 'num_games', 'seed']  #the number of teams comes from the file
+
+    def clean_roster(self):
+        roster = self.cleaned_data.get('roster')
+        if roster and format_of(roster.name) is None:
+            raise forms.ValidationError("The roster must be a .csv or .ndjson file.")
+        return roster
+
+    def clean(self):
+        #the team and game counts are checked against the file when it is imported
+        return forms.ModelForm.clean(self)
@@ -0,0 +1,107 @@
+#Hinsley Casenet - U59220930
+#project/generation.py - random generation of the teams and players of a new league
+
+from django.db import transaction
+
+from .concurrency import retry_on_lock
+from .models import Player, Standing, Team
+from .names import player_names, team_names
+from .simulation import ROSTERS_STREAM, stream
+from .standings import build_standings, empty_records
+
+POSITIONS = ["Forward", "Guard", "Center"]
+
+ROSTER_SIZE = 5  #each team has a roster of 5 players
+STAR_CHANCE = 0.2  #20% chance for a player to be a star
+
+
+def build_league(league):
+    '''builds the teams and players of a league in memory - returns the teams and a list with the roster
+    of every team, star counts and multipliers are already filled in'''
+
+    #rosters are drawn from the league seed so the same seed always generates the same league
+    rng = stream(league.seed, ROSTERS_STREAM)
+
+    num_teams = max(league.num_teams, 0)
+    num_players = num_teams * ROSTER_SIZE
+
+    #every name is unique, and the rest of the player attributes are drawn for the whole league at once
+    identities = team_names(num_teams, rng)
+    full_names = player_names(num_players, rng)
+    positions = rng.integers(len(POSITIONS), size=num_players).tolist()
+    stars = (rng.random(num_players) < STAR_CHANCE).tolist()
+    birth_years = rng.integers(1985, 2006, size=num_players).tolist()
+    birth_months = rng.integers(1, 13, size=num_players).tolist()
+    birth_days = rng.integers(1, 29, size=num_players).tolist()
+
+    teams, rosters = [], []
+    for i, (city, name) in enumerate(identities):
+        team = Team(
+            league=league,
+            name=name,
+            city=city,
+            #default values for teams, before the first game the teams are ranked in order
+            place_in_standings=i + 1,
+            wins=0,
+            losses=0,
+        )
+
+        #player generation for the team
+        roster = []
+        for p in range(i * ROSTER_SIZE, (i + 1) * ROSTER_SIZE):
+            first_name, last_name = full_names[p]
+            roster.append(Player(
+                first_name=first_name,
+                last_name=last_name,
+                position=POSITIONS[positions[p]],
+                star=stars[p],
+                dob=f"{birth_years[p]}-{birth_months[p]:02}-{birth_days[p]:02}",
+            ))
+
+        #the star count and multiplier are known before the team is inserted
+        team.star_count = sum(player.star for player in roster)
+        team.star_mult = Team.star_multiplier(team.star_count)
+
+        teams.append(team)
+        rosters.append(roster)
+
+    return teams, rosters
+
+
+def league_size_error(num_teams, num_games):
+    '''same rules as the league creation form, for leagues created without it - returns the problem with
+    the number of teams and games, or None'''
+
+    if num_teams < 2:
+        return "A league must have at least 2 teams."
+    if num_games < num_teams - 1:
+        return f"A league with {num_teams} teams must have at least {num_teams - 1} games."
+    return None
+
+
+def insert_league(league, teams, rosters, batch_size=None):
+    '''inserts the teams of a league and their rosters with one bulk insert per model (the empty standings
+    included) - has to run in a transaction'''
+
+    #the bulk insert fills in the primary keys, so the players can point at their team right after
+    Team.objects.bulk_create(teams)
+
+    players = []
+    for team, roster in zip(teams, rosters):
+        for player in roster:
+            player.team = team
+            players.append(player)
+    Player.objects.bulk_create(players, batch_size=batch_size)
+
+    #every team starts with an empty row in the standings
+    Standing.objects.bulk_create(build_standings(league, teams, empty_records(len(teams))))
+    return teams
+
+
+@retry_on_lock
+def generate_league(league):
+    '''randomly generates the teams and players of a league and inserts them, in a single transaction'''
+
+    teams, rosters = build_league(league)
+    with transaction.atomic():
+        return insert_league(league, teams, rosters)
@@ -0,0 +1,196 @@
+#Hinsley Casenet - U59220930
+#project/imports.py - loads the teams and players of a new league from a roster file (csv or ndjson),
+#read line by line, checked against the models and written with one bulk insert per model
+
+import csv
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .generation import POSITIONS, insert_league, league_size_error
+from .models import Player, Team
+
+IMPORT_FORMATS = ['csv', 'ndjson']
+
+#one row per player, the team is named on every row - a row with only the team columns adds a team with
+#no players. the rosters export writes these columns (and a few more, which are ignored)
+TEAM_COLUMNS = ['city', 'team_name']
+PLAYER_COLUMNS = ['first_name', 'last_name', 'position', 'star', 'dob']
+
+IMPORT_BATCH_SIZE = 500  #rows checked together, and players per insert
+MAX_REPORTED_ERRORS = 50
+
+TRUE_VALUES = {'true', 'yes', 'y', '1'}
+FALSE_VALUES = {'false', 'no', 'n', '0', ''}
+
+
+class RosterImportError(Exception):
+    '''raised when a roster file cannot be imported - errors is a list of (line, message), line is None
+    for problems with the file as a whole'''
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f'{len(errors)} error(s) in the roster file')
+
+    def messages(self):
+        '''the errors as text, at most MAX_REPORTED_ERRORS of them'''
+
+        lines = [message if line is None else f'Line {line}: {message}' for line, message in self.errors[:MAX_REPORTED_ERRORS]]
+        if len(self.errors) > MAX_REPORTED_ERRORS:
+            lines.append(f'... and {len(self.errors) - MAX_REPORTED_ERRORS} more')
+        return lines
+
+
+def format_of(filename):
+    '''the import format picked from the extension of a file name, or None'''
+
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def read_rows(lines, import_format, errors):
+    '''yields (line number, row) for every row of a text file, one line at a time - lines that cannot be
+    read are added to errors'''
+
+    if import_format == 'csv':
+        reader = csv.DictReader(lines)
+        missing = [column for column in TEAM_COLUMNS + PLAYER_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            errors.append((1, f"missing column(s): {', '.join(missing)}"))
+            return
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            errors.append((number, f'not valid json ({error})'))
+            continue
+        if not isinstance(row, dict):
+            errors.append((number, 'expected an object'))
+            continue
+        yield number, row
+
+
+def parse_star(value):
+    '''the star column as a bool, raises ValueError for anything else'''
+
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f'star must be true or false, not "{value}"')
+
+
+def check_player(player):
+    '''model validation of a player and the rules the generated rosters follow - returns the messages'''
+
+    problems = []
+    try:
+        player.full_clean(exclude=['team'])
+    except ValidationError as error:
+        problems.extend(f'{field}: {" ".join(messages)}' for field, messages in error.message_dict.items())
+
+    if player.position and player.position not in POSITIONS:
+        problems.append(f"position must be one of {', '.join(POSITIONS)}")
+    if player.dob:
+        try:
+            datetime.date.fromisoformat(player.dob)
+        except ValueError:
+            problems.append('dob must be a date (YYYY-MM-DD)')
+    return problems
+
+
+def check_batch(batch, league, teams, rosters, errors):
+    '''checks one batch of rows - new teams and the players are added to teams and rosters (keyed by
+    (city, name)), the problems to errors'''
+
+    for line, row in batch:
+        values = {column: '' if row.get(column) is None else row.get(column) for column in TEAM_COLUMNS + PLAYER_COLUMNS}
+        key = (str(values['city']).strip(), str(values['team_name']).strip())
+
+        if key not in teams:
+            team = Team(league=league, city=key[0], name=key[1], star_mult=0)
+            try:
+                team.full_clean(exclude=['league'])
+            except ValidationError as error:
+                errors.extend((line, f'{field}: {" ".join(messages)}') for field, messages in error.message_dict.items())
+                continue
+            teams[key] = team
+            rosters[key] = []
+
+        #only the team columns are filled in, the row adds the team alone
+        if all(values[column] in ('', None) for column in PLAYER_COLUMNS):
+            continue
+
+        try:
+            star = parse_star(values['star'])
+        except ValueError as error:
+            errors.append((line, str(error)))
+            continue
+
+        player = Player(
+            first_name=str(values['first_name']).strip(),
+            last_name=str(values['last_name']).strip(),
+            position=str(values['position']).strip(),
+            star=star,
+            dob=str(values['dob']).strip(),
+        )
+        problems = check_player(player)
+        if problems:
+            errors.extend((line, problem) for problem in problems)
+            continue
+        rosters[key].append(player)
+
+
+def parse_roster(league, lines, import_format):
+    '''reads and checks a roster file - returns the unsaved teams and the roster of every team, in the
+    order they first appear in the file. raises RosterImportError with every problem found'''
+
+    errors = []
+    teams, rosters = {}, {}
+
+    batch = []
+    for row in read_rows(lines, import_format, errors):
+        batch.append(row)
+        if len(batch) == IMPORT_BATCH_SIZE:
+            check_batch(batch, league, teams, rosters, errors)
+            batch = []
+    check_batch(batch, league, teams, rosters, errors)
+
+    if not errors:
+        size_error = league_size_error(len(teams), league.num_games)
+        if size_error:
+            errors.append((None, size_error))
+    if errors:
+        raise RosterImportError(errors)
+
+    return list(teams.values()), list(rosters.values())
+
+
+def import_league(league, lines, import_format):
+    '''saves a new league with the teams and players of a roster file and their empty standings, in one
+    transaction - nothing is written when the file has errors. returns the teams'''
+
+    teams, rosters = parse_roster(league, lines, import_format)
+
+    for place, (team, roster) in enumerate(zip(teams, rosters), 1):
+        team.place_in_standings = place
+        team.star_count = sum(player.star for player in roster)
+        team.star_mult = Team.star_multiplier(team.star_count)
+
+    with transaction.atomic():
+        league.num_teams = len(teams)
+        league.save()
+        return insert_league(league, teams, rosters, batch_size=IMPORT_BATCH_SIZE)
@@ -0,0 +1,195 @@
+#Hinsley Casenet - U59220930
+#project/jobs.py - local simulation job queue, jobs are stored in the db and picked up by worker processes
+
+import time
+import traceback
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .concurrency import acquire_league_lock, league_lock, release_league_lock, renew_league_lock, retry_on_lock
+from .models import LeagueLock, SimulationJob
+from .simulation import SimulationError, play_games, simulate_league, simulate_next_day, start_season
+
+
+@retry_on_lock
+def enqueue_simulation(league, action=SimulationJob.SEASON, through_date=None, idempotency_key=''):
+    '''queues a simulation of the league and returns the job right away, with whether it is new - a request
+    that repeats the idempotency key, or asks for the same simulation as a job that has not finished yet,
+    attaches to that job instead of queueing another run'''
+
+    jobs = SimulationJob.objects.filter(league=league)
+    #the look up and the insert share one transaction, so two requests cannot both miss the other's job
+    with transaction.atomic(savepoint=False):
+        job = jobs.filter(idempotency_key=idempotency_key).first() if idempotency_key else None
+        if job is None:
+            #a running job whose worker died is not followed, the next worker to start fails it
+            job = jobs.filter(Q(status=SimulationJob.QUEUED) | live_running_jobs(timezone.now())).filter(
+                action=action, through_date=through_date
+            ).order_by('created_at', 'id').first()
+        if job is not None:
+            return job, False
+
+        if not idempotency_key:
+            return SimulationJob.objects.create(league=league, action=action, through_date=through_date), True
+        try:
+            #the savepoint keeps the transaction usable when another request inserted the same key first
+            with transaction.atomic():
+                return SimulationJob.objects.create(
+                    league=league, action=action, through_date=through_date, idempotency_key=idempotency_key
+                ), True
+        except IntegrityError:
+            return jobs.get(idempotency_key=idempotency_key), False
+
+
+def apply_action(league, action, through_date=None, progress=None):
+    '''runs a simulation action on a league whose lock is held and returns the games it wrote'''
+
+    #another run may have finished while this one waited, its season and seed are the ones to go on from
+    league.refresh_from_db()
+
+    if action == SimulationJob.NEW_SEASON:
+        return start_season(league, progress=progress)
+    if action == SimulationJob.NEXT_DAY:
+        return simulate_next_day(league, progress=progress)
+    if action == SimulationJob.THROUGH_DATE:
+        return play_games(league, through=through_date, progress=progress)
+    return simulate_league(league, progress=progress)
+
+
+@retry_on_lock
+def run_action(league, action=SimulationJob.SEASON, through_date=None, progress=None, owner=None, wait=0):
+    '''runs a simulation action on the league right away and returns the games it wrote, used by the
+    management commands - the league is locked for the run, a run that finds it locked waits up to wait
+    seconds and then raises LeagueBusy'''
+
+    with league_lock(league, owner=owner, wait=wait):
+        return apply_action(league, action, through_date, progress)
+
+
+def perform(job, progress):
+    '''runs the action of the job and returns the games it wrote, the job holds the league lock since
+    it was claimed'''
+
+    return retry_on_lock(apply_action)(job.league, job.action, job.through_date, progress)
+
+
+def live_running_jobs(now):
+    '''filter of the running jobs whose worker is alive - they hold their league lock and it has not expired,
+    a live run renews it every time it reports progress'''
+
+    return Q(status=SimulationJob.RUNNING, league_lock__expires_at__gt=now)
+
+
+@retry_on_lock
+def fail_stale_jobs():
+    '''fails the running jobs whose worker died, returns how many there were'''
+
+    stale = SimulationJob.objects.filter(status=SimulationJob.RUNNING).exclude(live_running_jobs(timezone.now()))
+    with transaction.atomic(savepoint=False):
+        job_ids = list(stale.values_list('pk', flat=True))
+        if not job_ids:
+            return 0
+        LeagueLock.objects.filter(job_id__in=job_ids).delete()
+        return SimulationJob.objects.filter(pk__in=job_ids, status=SimulationJob.RUNNING).update(
+            status=SimulationJob.FAILED, message="The worker running this job stopped.", finished_at=timezone.now()
+        )
+
+
+@retry_on_lock
+def claim_next_job():
+    '''claims the oldest queued job for this worker and takes its league lock in the same transaction -
+    the conditional update makes sure two workers can never claim the same job, returns None when the
+    queue is empty. jobs of a league that is locked wait in the queue until that run is over'''
+
+    fail_stale_jobs()
+    while True:
+        now = timezone.now()
+        job = (SimulationJob.objects.filter(status=SimulationJob.QUEUED)
+               .exclude(league__lock__expires_at__gt=now).order_by('created_at', 'id').first())
+        if job is None:
+            return None
+
+        with transaction.atomic(savepoint=False):
+            claimed = SimulationJob.objects.filter(pk=job.pk, status=SimulationJob.QUEUED).update(
+                status=SimulationJob.RUNNING, started_at=now
+            )
+            if claimed:
+                lock = acquire_league_lock(job.league, job_lock_token(job), f'job {job.pk}', job=job)
+                if lock.job_id != job.pk:
+                    #a command took the league since the look up, the job stays queued
+                    SimulationJob.objects.filter(pk=job.pk).update(status=SimulationJob.QUEUED, started_at=None)
+                    continue
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def job_lock_token(job):
+    '''token of the league lock a job holds'''
+
+    return f'job-{job.pk}'
+
+
+def run_job(job):
+    '''runs a claimed job to completion, recording progress along the way and the error if it fails'''
+
+    @retry_on_lock
+    def progress(percent, message):
+        #every step is also the heartbeat of the run, a run that lost its lock stops before it writes again
+        if not renew_league_lock(job.league_id, job_lock_token(job)):
+            raise SimulationError("The league lock was lost, the run was stopped.")
+        SimulationJob.objects.filter(pk=job.pk).update(progress=percent, message=message)
+
+    try:
+        games = perform(job, progress)
+    except SimulationError as error:
+        job.status, job.message = SimulationJob.FAILED, str(error)
+    except Exception:
+        job.status, job.message = SimulationJob.FAILED, traceback.format_exc(limit=5)
+    else:
+        job.status, job.progress = SimulationJob.DONE, 100
+        verb = "Scheduled" if job.action == SimulationJob.NEW_SEASON else "Simulated"
+        job.message = f"{verb} {len(games)} games."
+
+    #an update of the running job only - the league (and the job with it) may have been deleted during the
+    #run, or the job failed as stale by another worker, then that outcome stands
+    job.finished_at = timezone.now()
+    finished = retry_on_lock(SimulationJob.objects.filter(pk=job.pk, status=SimulationJob.RUNNING).update)(
+        status=job.status, progress=job.progress, message=job.message, finished_at=job.finished_at
+    )
+    if not finished:
+        job.status = SimulationJob.FAILED
+    #given back after the status is saved, a running job never goes without its lock
+    release_league_lock(job.league_id, job_lock_token(job))
+    return job
+
+
+def work(poll_interval=1.0, once=False, log=print):
+    '''worker loop - runs queued jobs one at a time and sleeps while the queue is empty,
+    with once=True it returns as soon as the queue is empty'''
+
+    close_old_connections()
+    failed = fail_stale_jobs()
+    if failed:
+        log(f"Failed {failed} job(s) left running by a stopped worker")
+
+    while True:
+        close_old_connections()
+        job = claim_next_job()
+
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        started = time.monotonic()
+        try:
+            job = run_job(job)
+        except Exception:
+            #a job that could not even record how it ended must not stop the jobs queued after it
+            log(f"Job {job.pk}: could not be finished\n{traceback.format_exc(limit=5)}")
+            continue
+        log(f"Job {job.pk} (league {job.league_id}): {job.get_status_display()} in {time.monotonic() - started:.2f}s - {job.message}")
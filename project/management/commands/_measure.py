@@ -0,0 +1,40 @@
+#Hinsley Casenet - U59220930
+#project/management/commands/_measure.py - timing and query counting shared by the league commands
+
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def measure():
+    '''times the block and counts the sql queries it runs - yields a dict with the seconds and queries,
+    filled in when the block exits. queries are counted with an execute wrapper, so it works with
+    DEBUG off and does not keep the sql around'''
+
+    result = {'seconds': 0.0, 'queries': 0}
+
+    def count_query(execute, sql, params, many, context):
+        result['queries'] += 1
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        with connection.execute_wrapper(count_query):
+            yield result
+    finally:
+        result['seconds'] = time.perf_counter() - started
+
+
+def describe(result):
+    '''short summary of a measurement for the command output'''
+
+    return f"{result['seconds']:.2f}s, {result['queries']} queries"
+
+
+def add_to(totals, result):
+    '''adds a measurement to the running totals of a batch'''
+
+    totals['seconds'] += result['seconds']
+    totals['queries'] += result['queries']
@@ -0,0 +1,32 @@
+#Hinsley Casenet - U59220930
+#project/management/commands/export_league.py - writes the games, standings or rosters of a league as csv or ndjson
+
+from django.core.management.base import BaseCommand, CommandError
+
+from project.exports import EXPORT_FORMATS, EXPORT_KINDS, stream_export
+from project.models import League
+
+
+class Command(BaseCommand):
+    help = 'Streams the games, standings or rosters of a league to stdout or a file as csv or ndjson'
+
+    def add_arguments(self, parser):
+        parser.add_argument('league_id', type=int, help='id of the league to export')
+        parser.add_argument('--kind', default='games', choices=list(EXPORT_KINDS), help='what to export, the games by default')
+        parser.add_argument('--format', default='csv', choices=list(EXPORT_FORMATS), help='csv (default) or ndjson')
+        parser.add_argument('--output', help='file to write to instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            league = League.objects.get(pk=options['league_id'])
+        except League.DoesNotExist:
+            raise CommandError(f"League {options['league_id']} does not exist.")
+
+        lines = stream_export(league, options['kind'], options['format'])
+        if options['output']:
+            #newline='' keeps the \r\n line endings of the csv writer as they are
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
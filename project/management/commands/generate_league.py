@@ -0,0 +1,79 @@
+#Hinsley Casenet - U59220930
+#project/management/commands/generate_league.py - creates leagues for a user without going through the web pages
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from project.generation import generate_league, league_size_error
+from project.jobs import enqueue_simulation, run_action
+from project.models import League
+from project.simulation import SimulationError
+
+from ._measure import add_to, describe, measure
+
+
+class Command(BaseCommand):
+    help = 'Creates one or more randomly generated leagues for a user and simulates their first season'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='username of the owner of the new leagues')
+        parser.add_argument('--teams', type=int, default=10, help='number of teams in every league')
+        parser.add_argument('--games', type=int, default=82, help='number of games every team plays')
+        parser.add_argument('--leagues', type=int, default=1, help='number of leagues to create')
+        parser.add_argument('--name', default='League', help='league name, numbered when creating many leagues')
+        parser.add_argument('--seed', type=int, help='seed of the first league, the next leagues count up from it')
+        parser.add_argument('--logo', default='nba_logo.jpg', help='logo file, relative to MEDIA_ROOT')
+
+        simulation = parser.add_mutually_exclusive_group()
+        simulation.add_argument('--queue', action='store_true',
+                                help='queue the first season for the simulation workers instead of running it')
+        simulation.add_argument('--no-games', action='store_true', help='do not simulate the first season')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User \"{options['user']}\" does not exist.")
+
+        num_teams, num_games, count = options['teams'], options['games'], options['leagues']
+
+        size_error = league_size_error(num_teams, num_games)
+        if size_error:
+            raise CommandError(size_error)
+        if count < 1:
+            raise CommandError("At least one league must be created.")
+
+        totals = {'seconds': 0.0, 'queries': 0}
+        for index in range(count):
+            name = options['name'] if count == 1 else f"{options['name']} {index + 1}"
+            fields = {'name': name, 'logo': options['logo'], 'num_teams': num_teams, 'num_games': num_games,
+                      'user_league': user}
+            if options['seed'] is not None:
+                fields['seed'] = options['seed'] + index
+
+            with measure() as created:
+                with transaction.atomic():
+                    league = League.objects.create(**fields)
+                    generate_league(league)
+            self.stdout.write(f"Created league {league.pk} ({league}): {num_teams} teams in {describe(created)}")
+            add_to(totals, created)
+
+            if options['no_games']:
+                continue
+            if options['queue']:
+                enqueue_simulation(league)
+                self.stdout.write(f"Queued the first season of league {league.pk}")
+                continue
+
+            try:
+                with measure() as simulated:
+                    games = run_action(league)
+            except SimulationError as error:
+                raise CommandError(f"League {league.pk} ({league}): {error}")
+            self.stdout.write(f"Simulated {len(games)} games in {describe(simulated)}")
+            add_to(totals, simulated)
+
+        if count > 1:
+            self.stdout.write(self.style.SUCCESS(f"Created {count} leagues in {describe(totals)}"))
+
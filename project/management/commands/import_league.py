@@ -0,0 +1,73 @@
+#Hinsley Casenet - U59220930
+#project/management/commands/import_league.py - creates a league from a roster file without going through the web pages
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from project.imports import IMPORT_FORMATS, RosterImportError, format_of, import_league
+from project.jobs import enqueue_simulation, run_action
+from project.models import League
+from project.simulation import SimulationError
+
+from ._measure import describe, measure
+
+
+class Command(BaseCommand):
+    help = 'Creates a league with the teams and players of a csv or ndjson roster file and simulates its first season'
+
+    def add_arguments(self, parser):
+        parser.add_argument('roster', help='roster file, one row per player (the rosters export can be used as it is)')
+        parser.add_argument('--user', required=True, help='username of the owner of the new league')
+        parser.add_argument('--name', default='League', help='league name')
+        parser.add_argument('--games', type=int, default=82, help='number of games every team plays')
+        parser.add_argument('--seed', type=int, help='seed of the league, random by default')
+        parser.add_argument('--logo', default='nba_logo.jpg', help='logo file, relative to MEDIA_ROOT')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='format of the file, picked from the extension by default')
+
+        simulation = parser.add_mutually_exclusive_group()
+        simulation.add_argument('--queue', action='store_true',
+                                help='queue the first season for the simulation workers instead of running it')
+        simulation.add_argument('--no-games', action='store_true', help='do not simulate the first season')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User \"{options['user']}\" does not exist.")
+
+        import_format = options['format'] or format_of(options['roster'])
+        if import_format is None:
+            raise CommandError("Give the --format of the roster file, it cannot be told from the extension.")
+
+        fields = {'name': options['name'], 'logo': options['logo'], 'num_games': options['games'], 'user_league': user}
+        if options['seed'] is not None:
+            fields['seed'] = options['seed']
+        league = League(**fields)
+
+        try:
+            with open(options['roster'], encoding='utf-8-sig', newline='') as roster, measure() as imported:
+                teams = import_league(league, roster, import_format)
+        except OSError as error:
+            raise CommandError(f"Cannot read {options['roster']}: {error}")
+        except UnicodeDecodeError:
+            raise CommandError(f"{options['roster']} was not imported: the roster must be utf-8 text.")
+        except RosterImportError as error:
+            for message in error.messages():
+                self.stderr.write(message)
+            raise CommandError(f"{options['roster']} was not imported: {error}")
+
+        self.stdout.write(f"Imported league {league.pk} ({league}): {len(teams)} teams in {describe(imported)}")
+
+        if options['no_games']:
+            return
+        if options['queue']:
+            enqueue_simulation(league)
+            self.stdout.write(f"Queued the first season of league {league.pk}")
+            return
+
+        try:
+            with measure() as simulated:
+                games = run_action(league)
+        except SimulationError as error:
+            raise CommandError(f"League {league.pk} ({league}): {error}")
+        self.stdout.write(f"Simulated {len(games)} games in {describe(simulated)}")
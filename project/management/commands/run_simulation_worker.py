@@ -0,0 +1,45 @@
+#Hinsley Casenet - U59220930
+#project/management/commands/run_simulation_worker.py - starts the local worker processes for queued simulations
+
+import multiprocessing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from project.jobs import work
+
+
+class Command(BaseCommand):
+    help = 'Runs local worker processes that pick up queued league simulations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.SIMULATION_WORKERS,
+                            help='number of worker processes (defaults to SIMULATION_WORKERS)')
+        parser.add_argument('--poll-interval', type=float, default=settings.SIMULATION_POLL_INTERVAL,
+                            help='seconds to wait between checks of an empty queue')
+        parser.add_argument('--once', action='store_true',
+                            help='run the jobs that are already queued and exit')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        worker_options = {'poll_interval': options['poll_interval'], 'once': options['once'], 'log': self.stdout.write}
+
+        self.stdout.write(f"Starting {workers} simulation worker(s)")
+        if workers == 1:
+            work(**worker_options)
+            return
+
+        #the workers are forked, so they must not share the parent's db connection
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=work, kwargs=worker_options, daemon=True) for _ in range(workers)]
+        for process in processes:
+            process.start()
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
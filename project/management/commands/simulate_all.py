@@ -0,0 +1,20 @@
+#Hinsley Casenet - U59220930
+#project/management/commands/simulate_all.py - simulates every league, for nightly batch runs
+
+from project.models import League
+
+from .simulate_league import Command as SimulateLeagueCommand
+
+
+class Command(SimulateLeagueCommand):
+    help = 'Simulates every league right away, or queues them all for the simulation workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='only simulate the leagues of this user')
+        self.add_simulation_arguments(parser)
+
+    def get_leagues(self, options):
+        leagues = League.objects.all()
+        if options['user']:
+            leagues = leagues.filter(user_league__username=options['user'])
+        return leagues
@@ -0,0 +1,89 @@
+#Hinsley Casenet - U59220930
+#project/management/commands/simulate_league.py - simulates leagues without going through the web pages
+
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from project.jobs import enqueue_simulation, run_action
+from project.models import League, SimulationJob
+from project.simulation import SimulationError
+
+from ._measure import add_to, describe, measure
+
+
+class Command(BaseCommand):
+    help = 'Simulates the given leagues right away, or queues them for the simulation workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('league_ids', nargs='*', type=int, help='ids of the leagues to simulate')
+        parser.add_argument('--user', help='simulate every league of this user')
+        self.add_simulation_arguments(parser)
+
+    def add_simulation_arguments(self, parser):
+        '''options shared with simulate_all'''
+
+        parser.add_argument('--action', default=SimulationJob.SEASON, choices=dict(SimulationJob.ACTION_CHOICES),
+                            help='what to simulate, a full season by default')
+        parser.add_argument('--through', type=datetime.date.fromisoformat,
+                            help='last date to play with --action through_date (YYYY-MM-DD)')
+        parser.add_argument('--queue', action='store_true',
+                            help='queue the simulations for the workers instead of running them')
+        parser.add_argument('--wait', type=float, default=settings.SIMULATION_LOCK_TIMEOUT,
+                            help='seconds to wait for a run that is already simulating a league (default: %(default)s)')
+
+    def get_leagues(self, options):
+        '''the leagues picked on the command line'''
+
+        if not options['league_ids'] and not options['user']:
+            raise CommandError("Give the ids of the leagues to simulate or a --user.")
+
+        leagues = League.objects.all()
+        if options['league_ids']:
+            leagues = leagues.filter(pk__in=options['league_ids'])
+        if options['user']:
+            leagues = leagues.filter(user_league__username=options['user'])
+        return leagues
+
+    def handle(self, *args, **options):
+        action, through_date = options['action'], options['through']
+        if action == SimulationJob.THROUGH_DATE and through_date is None:
+            raise CommandError("--through is required with --action through_date.")
+
+        #only the ids are read up front, every league is loaded right before it is simulated
+        league_ids = list(self.get_leagues(options).order_by('id').values_list('id', flat=True))
+        if not league_ids:
+            raise CommandError("No leagues to simulate.")
+
+        totals = {'seconds': 0.0, 'queries': 0}
+        num_games, failed = 0, 0
+        for league_id in league_ids:
+            league = League.objects.get(pk=league_id)
+
+            if options['queue']:
+                job, created = enqueue_simulation(league, action=action, through_date=through_date)
+                state = "Queued" if created else "Already queued:"
+                self.stdout.write(f"{state} job {job.pk} for league {league.pk} ({league})")
+                continue
+
+            try:
+                with measure() as simulated:
+                    games = run_action(league, action, through_date, wait=options['wait'])
+            except SimulationError as error:
+                failed += 1
+                self.stderr.write(f"League {league.pk} ({league}): {error}")
+                continue
+
+            self.stdout.write(f"League {league.pk} ({league}): {len(games)} games in {describe(simulated)}")
+            add_to(totals, simulated)
+            num_games += len(games)
+
+        if options['queue']:
+            return
+        if len(league_ids) > 1:
+            self.stdout.write(self.style.SUCCESS(
+                f"Simulated {num_games} games in {len(league_ids) - failed} leagues in {describe(totals)}"
+            ))
+        if failed:
+            raise CommandError(f"{failed} of {len(league_ids)} leagues could not be simulated.")
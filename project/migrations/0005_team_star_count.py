@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+def populate_star_count(apps, schema_editor):
+    '''fills in the star count of existing teams and stores star_mult in its integer form'''
+
+    Team = apps.get_model('project', 'Team')
+    Player = apps.get_model('project', 'Player')
+
+    star_counts = dict(
+        Player.objects.filter(star=True).values('team').annotate(count=models.Count('id')).values_list('team', 'count')
+    )
+    teams = list(Team.objects.all())
+    for team in teams:
+        team.star_count = star_counts.get(team.pk, 0)
+        team.star_mult = int(team.star_count * 1.02 * 100)
+    Team.objects.bulk_update(teams, ['star_count', 'star_mult'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0004_game_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='star_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_star_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.3 on 2026-10-18 16:45
+
+import secrets
+
+import project.models
+from django.db import migrations, models
+
+
+def populate_seeds(apps, schema_editor):
+    '''gives every existing league its own seed - a callable default is only evaluated once for all rows'''
+
+    League = apps.get_model('project', 'League')
+
+    leagues = list(League.objects.all())
+    for league in leagues:
+        league.seed = secrets.randbits(63)
+    League.objects.bulk_update(leagues, ['seed'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0006_simulationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='league',
+            name='seed',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(populate_seeds, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='league',
+            name='seed',
+            field=models.BigIntegerField(default=project.models.generate_seed),
+        ),
+        migrations.AddField(
+            model_name='league',
+            name='season',
+            field=models.IntegerField(default=0),
+        ),
+    ]
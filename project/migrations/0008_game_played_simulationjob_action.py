@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+def mark_existing_games_played(apps, schema_editor):
+    '''every game stored before seasons could be played day by day was already simulated'''
+
+    Game = apps.get_model('project', 'Game')
+    Game.objects.update(played=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0007_league_seed_league_season'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='played',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_existing_games_played, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='simulationjob',
+            name='action',
+            field=models.CharField(choices=[('season', 'Simulate full season'), ('new_season', 'Start new season'), ('next_day', 'Simulate next day'), ('through_date', 'Simulate through date')], default='season', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='simulationjob',
+            name='through_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 16:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0008_game_played_simulationjob_action'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['date', 'id'], name='game_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.1.3 on 2026-10-18 16:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def count_standings(num_teams, played):
+    '''standings rows of num_teams teams from their played games, given in the order they were played as
+    (home index, away index, home points, away points) - a frozen copy of project/standings.py as it was
+    when this migration was written, so later changes to that module cannot change what it does'''
+
+    wins, losses = [0] * num_teams, [0] * num_teams
+    points_for, points_against = [0] * num_teams, [0] * num_teams
+    streak = [0] * num_teams
+
+    for home, away, home_points, away_points in played:
+        winner, loser = (home, away) if home_points > away_points else (away, home)
+        wins[winner] += 1
+        losses[loser] += 1
+        points_for[home] += home_points
+        points_for[away] += away_points
+        points_against[home] += away_points
+        points_against[away] += home_points
+        streak[winner] = streak[winner] + 1 if streak[winner] > 0 else 1
+        streak[loser] = streak[loser] - 1 if streak[loser] < 0 else -1
+
+    if not num_teams:
+        return []
+
+    #most wins then fewest losses, ties keep the team order
+    order = sorted(range(num_teams), key=lambda index: (-wins[index], losses[index], index))
+    places = [0] * num_teams
+    for place, index in enumerate(order, start=1):
+        places[index] = place
+    leader = order[0]
+
+    rows = []
+    for index in range(num_teams):
+        games = wins[index] + losses[index]
+        rows.append({
+            'place': places[index],
+            'wins': wins[index],
+            'losses': losses[index],
+            'win_pct': wins[index] / games if games else 0.0,
+            'games_back': ((wins[leader] - wins[index]) + (losses[index] - losses[leader])) / 2,
+            'points_for': points_for[index],
+            'points_against': points_against[index],
+            'streak': streak[index],
+        })
+    return rows
+
+
+def populate_standings(apps, schema_editor):
+    '''counts the standings of every existing league from its played games'''
+
+    League = apps.get_model('project', 'League')
+    Team = apps.get_model('project', 'Team')
+    Game = apps.get_model('project', 'Game')
+    Standing = apps.get_model('project', 'Standing')
+
+    for league in League.objects.all():
+        teams = list(Team.objects.filter(league=league).order_by('id'))
+        index_of = {team.pk: index for index, team in enumerate(teams)}
+        played = [
+            (index_of[team1], index_of[team2], team1_points, team2_points)
+            for team1, team2, team1_points, team2_points in Game.objects.filter(team1__league=league, played=True)
+            .order_by('date', 'id').values_list('team1_id', 'team2_id', 'points_scored_team1', 'points_scored_team2')
+        ]
+        Standing.objects.bulk_create([
+            Standing(league=league, team=team, **row) for team, row in zip(teams, count_standings(len(teams), played))
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0009_game_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Standing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('place', models.IntegerField(default=0)),
+                ('wins', models.IntegerField(default=0)),
+                ('losses', models.IntegerField(default=0)),
+                ('win_pct', models.FloatField(default=0)),
+                ('games_back', models.FloatField(default=0)),
+                ('points_for', models.IntegerField(default=0)),
+                ('points_against', models.IntegerField(default=0)),
+                ('streak', models.IntegerField(default=0)),
+                ('league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='project.league')),
+                ('team', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='standing', to='project.team')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['league', 'place'], name='standing_league_place_idx')],
+            },
+        ),
+        migrations.RunPython(populate_standings, migrations.RunPython.noop),
+    ]
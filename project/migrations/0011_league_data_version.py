@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0010_standing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='league',
+            name='data_version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
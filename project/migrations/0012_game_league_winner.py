@@ -0,0 +1,85 @@
+# Generated by Django 5.1.3 on 2026-10-18 16:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_league_and_winner(apps, schema_editor):
+    '''copies the league of the home team onto every game and points the winner at a team - the winner is
+    taken from the score, the old text could be stale after a team was renamed'''
+
+    Game = apps.get_model('project', 'Game')
+    Team = apps.get_model('project', 'Team')
+
+    Game.objects.update(
+        league=models.Subquery(Team.objects.filter(pk=models.OuterRef('team1')).values('league')[:1]),
+        winner_team=models.Case(
+            models.When(played=False, then=None),
+            models.When(points_scored_team1__gt=models.F('points_scored_team2'), then=models.F('team1')),
+            default=models.F('team2'),
+        ),
+    )
+
+
+def populate_winner_text(apps, schema_editor):
+    '''writes the winner back as text when the migration is reversed'''
+
+    Game = apps.get_model('project', 'Game')
+    Team = apps.get_model('project', 'Team')
+
+    names = {team.pk: f'{team.city} {team.name}' for team in Team.objects.all()}
+    games = list(Game.objects.exclude(winner_team=None))
+    for game in games:
+        game.winner = names[game.winner_team_id]
+    Game.objects.bulk_update(games, ['winner'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0011_league_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='league',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='games', to='project.league'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='winner_team',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='games_won', to='project.team'),
+        ),
+        migrations.RunPython(populate_league_and_winner, populate_winner_text),
+        migrations.RemoveField(
+            model_name='game',
+            name='winner',
+        ),
+        migrations.RenameField(
+            model_name='game',
+            old_name='winner_team',
+            new_name='winner',
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='league',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='games', to='project.league'),
+        ),
+        migrations.RemoveIndex(
+            model_name='game',
+            name='game_date_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['league', 'date'], name='game_league_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['team1', 'date'], name='game_team1_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['team2', 'date'], name='game_team2_date_idx'),
+        ),
+    ]
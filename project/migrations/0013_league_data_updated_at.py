@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-18 16:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0012_game_league_winner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='league',
+            name='data_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-18 17:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0013_league_data_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeagueLock',
+            fields=[
+                ('league', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='lock', serialize=False, to='project.league')),
+                ('token', models.CharField(max_length=32)),
+                ('owner', models.CharField(blank=True, max_length=100)),
+                ('acquired_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='simulationjob',
+            name='idempotency_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='simulationjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key', ''), _negated=True), fields=('league', 'idempotency_key'), name='unique_simulation_job_key'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-18 17:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0014_league_lock_and_job_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaguelock',
+            name='job',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='league_lock', to='project.simulationjob'),
+        ),
+    ]
@@ -1,14 +1,21 @@
 #Hinsley Casenet - U59220930
 #project/models.py - used to encapsulate the model representations of different objects for the league simulator
 
-from django.db import models
-import time, random
+from django.db import models, transaction
+import time, secrets
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.utils import timezone
+from .simulation import SCORES_STREAM, draw_scores, stream
 
 # Create your models here.
 
+def generate_seed():
+    '''Returns a fresh random seed for a new league'''
+
+    return secrets.randbits(63)
+
+
 class League(models.Model):
     '''Represents a sports league containing multiple teams'''
 
@@ -17,6 +24,10 @@ class League(models.Model):
     num_teams = models.IntegerField(default=0)
     num_games = models.IntegerField(default=0)
     user_league = models.ForeignKey(User, on_delete=models.CASCADE)
+    seed = models.BigIntegerField(default=generate_seed)  #root of every random stream used by the league
+    season = models.IntegerField(default=0)  #number of seasons simulated from the seed so far
+    data_version = models.IntegerField(default=0)  #bumped whenever the games, teams or players change
+    data_updated_at = models.DateTimeField(default=timezone.now)  #when data_version was last bumped
 
     def __str__(self):
         '''Return a representation of this model'''
@@ -29,6 +40,12 @@ class League(models.Model):
         self.num_teams = Team.objects.filter(league=self).count()
         self.save()
 
+    def bump_data_version(self):
+        '''Marks everything cached for the league as stale - called in the same transaction as the change'''
+
+        League.objects.filter(pk=self.pk).update(data_version=models.F('data_version') + 1, data_updated_at=timezone.now())
+        self.refresh_from_db(fields=['data_version', 'data_updated_at'])
+
     def get_absolute_url(self):
         '''Returns a url for the object'''
 
@@ -47,6 +64,7 @@ class Team(models.Model):
     losses = models.IntegerField(default=0)
     league = models.ForeignKey(League, on_delete=models.CASCADE)
     star_mult = models.IntegerField(blank=False)
+    star_count = models.IntegerField(default=0)  #denormalized number of star players, kept in sync with the roster
 
     def team_schedule(self):
         '''Returns all games this team is involved in'''
@@ -58,18 +76,68 @@ class Team(models.Model):
 
         return Player.objects.filter(team=self)
 
+    @staticmethod
+    def star_multiplier(star_count):
+        '''Returns the stored multiplier for a number of star players (1.02 per star, as a percentage)'''
+
+        return int(star_count * 1.02 * 100)
+
+    def update_star_count(self):
+        '''Recounts the star players on the roster - called whenever a player is created or edited'''
+
+        self.star_count = self.roster().filter(star=True).count()
+        self.star_mult = Team.star_multiplier(self.star_count)
+        self.save(update_fields=['star_count', 'star_mult'])
+
     def win_chance_modifier(self):
-        '''Calculates a boosted win% chance per star player on the roster'''
+        '''Returns the boosted win% chance per star player on the roster, read from the stored star count'''
 
-        star_count = self.roster().filter(star=True).count()
-        self.star_mult = star_count * 1.02
-        return star_count
+        return self.star_count
     
     def __str__(self):
         '''Returns a string representation of the team'''
         return f'{self.city} {self.name}'
 
 
+class Standing(models.Model):
+    '''Materialized standings row of a team - written together with the games it was counted from,
+    never edited directly'''
+
+    league = models.ForeignKey(League, on_delete=models.CASCADE, related_name='standings')
+    team = models.OneToOneField(Team, on_delete=models.CASCADE, related_name='standing')
+    place = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+    losses = models.IntegerField(default=0)
+    win_pct = models.FloatField(default=0)
+    games_back = models.FloatField(default=0)
+    points_for = models.IntegerField(default=0)
+    points_against = models.IntegerField(default=0)
+    streak = models.IntegerField(default=0)  #positive for a winning streak, negative for a losing one
+
+    class Meta:
+        #the standings of a league are always read in order of place
+        indexes = [models.Index(fields=['league', 'place'], name='standing_league_place_idx')]
+
+    def point_differential(self):
+        '''Returns the points scored minus the points allowed'''
+
+        return self.points_for - self.points_against
+
+    def streak_display(self):
+        '''Returns the streak as W3 / L2, or - before the first game'''
+
+        if self.streak > 0:
+            return f'W{self.streak}'
+        if self.streak < 0:
+            return f'L{-self.streak}'
+        return '-'
+
+    def __str__(self):
+        '''String representation of a standings row'''
+
+        return f'{self.place}. {self.team} ({self.wins}-{self.losses})'
+
+
 class Player(models.Model):
     '''Model created to represent the different players on different teams'''
 
@@ -92,12 +160,23 @@ class Player(models.Model):
 class Game(models.Model):
     '''Model to encapsulate a game played between two teams'''
 
+    league = models.ForeignKey(League, related_name='games', on_delete=models.CASCADE)  #copy of team1.league, so league queries skip the teams
     team1 = models.ForeignKey(Team, related_name='home', on_delete=models.CASCADE)
     team2 = models.ForeignKey(Team, related_name='away', on_delete=models.CASCADE)
     points_scored_team1 = models.IntegerField(default=0)
     points_scored_team2 = models.IntegerField(default=0)
-    winner = models.TextField(blank=True)
+    winner = models.ForeignKey(Team, related_name='games_won', on_delete=models.CASCADE, null=True, blank=True)
     date = models.DateField(default=timezone.now)  #date included for date logic (12/1)
+    played = models.BooleanField(default=False)  #games are scheduled up front and played day by day
+
+    class Meta:
+        #league games are read and paged by date (sqlite keeps the id at the end of every index, so the
+        #game log's (date, id) order comes straight from the league index), team games by date as well
+        indexes = [
+            models.Index(fields=['league', 'date'], name='game_league_date_idx'),
+            models.Index(fields=['team1', 'date'], name='game_team1_date_idx'),
+            models.Index(fields=['team2', 'date'], name='game_team2_date_idx'),
+        ]
 
     # def star_bonuses(self):
     #     '''original method to get and return star bonuses, not used'''
@@ -106,40 +185,146 @@ class Game(models.Model):
     #     team2_star_bonus = self.team2.win_chance_modifier
     #     return team1_star_bonus, team2_star_bonus
 
-    def points_scored(self, *args, **kwargs):
-        '''Using the win modifiers to calculate the points scored'''
+    def points_scored(self, rng=None, *args, **kwargs):
+        '''Using the win modifiers to calculate the points scored - rng is the numpy generator to draw from,
+        by default the game's own stream of the league seed (see score_stream)'''
+
+        if rng is None:
+            rng = self.score_stream()
 
         team1_star_bonus = self.team1.win_chance_modifier()
         team2_star_bonus = self.team2.win_chance_modifier()
 
-        #defines the range for possible points scored for each team affected by the star bonus!
-        team1_min_points = 70 + int(team1_star_bonus)
-        team1_max_points = 140 + int(team1_star_bonus)
-        team2_min_points = 70 + int(team2_star_bonus)
-        team2_max_points = 140 + int(team2_star_bonus)
-
-        #randomly assign each team points given that there are no points for the game yet
+        #randomly assign each team points given that there are no points for the game yet - the draw
+        #(including the anti tie logic) is shared with the season engine
         if self.points_scored_team1 == 0 and self.points_scored_team2 == 0:
-            self.points_scored_team1 = random.randint(team1_min_points, team1_max_points)
-            self.points_scored_team2 = random.randint(team2_min_points, team2_max_points)
+            team1_points, team2_points = draw_scores(team1_star_bonus, team2_star_bonus, rng)
+            self.points_scored_team1 = int(team1_points)
+            self.points_scored_team2 = int(team2_points)
 
-        #anti tie logic - randomly give one of the teams one more point, possibly code for overtime logic later!
+        #anti tie logic for scores that were entered by hand - randomly give one of the teams one more point
         if self.points_scored_team1 == self.points_scored_team2:
-            if random.choice([True, False]):
+            if rng.random() < 0.5:
                 self.points_scored_team1 += 1
             else:
                 self.points_scored_team2 += 1
 
         #logic to assign a winner
-        if not self.winner:
+        if self.winner_id is None:
             if self.points_scored_team1 > self.points_scored_team2:
-                self.winner = str(self.team1)
+                self.winner = self.team1
             else:
-                self.winner = str(self.team2)
-
-        self.save()
+                self.winner = self.team2
+
+        #only a game played for the first time moves the standings, replaying one leaves them as they are
+        from .standings import record_game
+        first_play = not self.played
+        self.played = True
+        with transaction.atomic():
+            self.save()
+            if first_play:
+                record_game(self)
+
+    def score_stream(self):
+        '''generator for the scores of this game, from the league seed like the season engine - keyed by the
+        season, the day of the season and the place of the game on its day, so the same game always gets the
+        same scores'''
+
+        position = Game.objects.filter(league_id=self.league_id).aggregate(
+            first_date=models.Min('date'),
+            earlier=models.Count('id', filter=models.Q(date=self.date, id__lt=self.pk)),
+        )
+        day = (self.date - position['first_date']).days
+        return stream(self.league.seed, SCORES_STREAM, self.league.season, day, position['earlier'])
+
+    def winning_team(self):
+        '''Returns the winner out of the two teams of the game, without another query when they are loaded'''
+
+        if self.winner_id is None:
+            return None
+        return self.team1 if self.winner_id == self.team1_id else self.team2
+
+    def save(self, *args, **kwargs):
+        '''Games always belong to the league of their teams'''
+
+        if self.league_id is None:
+            self.league_id = self.team1.league_id
+        super().save(*args, **kwargs)
 
     def __str__(self):
         '''String representation of a game'''
 
-        return f'{self.team1} vs {self.team2} - Winner: {self.winner}'
+        return f'{self.team1} vs {self.team2} - Winner: {self.winning_team()}'
+
+
+class SimulationJob(models.Model):
+    '''Model to track a league simulation that runs in a background worker'''
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    #what the job does - replay a full season, schedule a new season without playing it, play the next
+    #day of the season or play every game up to through_date
+    SEASON = 'season'
+    NEW_SEASON = 'new_season'
+    NEXT_DAY = 'next_day'
+    THROUGH_DATE = 'through_date'
+    ACTION_CHOICES = [
+        (SEASON, 'Simulate full season'),
+        (NEW_SEASON, 'Start new season'),
+        (NEXT_DAY, 'Simulate next day'),
+        (THROUGH_DATE, 'Simulate through date'),
+    ]
+
+    league = models.ForeignKey(League, on_delete=models.CASCADE)
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES, default=SEASON)
+    through_date = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    progress = models.IntegerField(default=0)  #percentage of the run that is complete
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    #sent with the simulate form - the same form posted twice gets the first job back instead of a new one
+    idempotency_key = models.CharField(max_length=64, blank=True, default='')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['league', 'idempotency_key'], condition=~models.Q(idempotency_key=''),
+                                    name='unique_simulation_job_key'),
+        ]
+
+    def is_finished(self):
+        '''Returns true once the job has either completed or failed'''
+
+        return self.status in (SimulationJob.DONE, SimulationJob.FAILED)
+
+    def __str__(self):
+        '''String representation of a simulation job'''
+
+        return f'Simulation of {self.league} - {self.get_status_display()}'
+
+
+class LeagueLock(models.Model):
+    '''Model to mark a league that is being simulated - one row per league, see concurrency.league_lock'''
+
+    league = models.OneToOneField(League, on_delete=models.CASCADE, primary_key=True, related_name='lock')
+    token = models.CharField(max_length=32)  #only the holder that created the row may remove it
+    owner = models.CharField(max_length=100, blank=True)  #who holds the lock, shown when another run waits
+    acquired_at = models.DateTimeField()
+    expires_at = models.DateTimeField()  #a lock left behind by a crashed process is taken over after this
+    #the queued job the lock was taken for, a running job without its lock was left behind by a dead worker
+    job = models.OneToOneField(SimulationJob, on_delete=models.CASCADE, null=True, blank=True, related_name='league_lock')
+
+    def __str__(self):
+        '''String representation of a league lock'''
+
+        return f'Lock on {self.league} held by {self.owner}'
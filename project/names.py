@@ -0,0 +1,132 @@
+#Hinsley Casenet - U59220930
+#project/names.py - unique team and player names for generated leagues of any size
+
+import numpy as np
+
+#name pools, loaded once when the module is imported
+TEAM_NAMES = (
+    "Hawks", "Fighters", "Giants", "Foxes", "Spinners", "Lions", "Panthers", "Wolves", "Dragons", "Tide",
+    "Dinos", "Eagles", "65ers", "Barons", "Newmans", "Wileys", "Blaze", "Tigers", "Kings", "Chuckers",
+    "Ardrats", "Gladiators", "Rexes", "Brewers", "Brave", "Stars", "Racers", "Menaces", "Thieves", "Maimers",
+    "Flight", "Muse", "Legends", "Glory", "Comets", "Rockets", "Storm", "Thunder", "Lightning", "Cyclones",
+    "Hurricanes", "Blizzard", "Avalanche", "Volcanoes", "Quakes", "Miners", "Pilots", "Captains", "Admirals", "Mariners",
+    "Pirates", "Buccaneers", "Raiders", "Rangers", "Outlaws", "Bandits", "Knights", "Warriors", "Titans", "Spartans",
+    "Trojans", "Vikings", "Samurai", "Ninjas", "Wizards", "Magic", "Sorcerers", "Phantoms", "Ghosts", "Shadows",
+    "Bulls", "Bears", "Stallions", "Mustangs", "Broncos", "Rams", "Bison", "Moose", "Grizzlies", "Cougars",
+    "Jaguars", "Leopards", "Cheetahs", "Lynx", "Bobcats", "Coyotes", "Jackals", "Hounds", "Huskies", "Badgers",
+    "Falcons", "Ravens", "Owls", "Condors", "Pelicans", "Herons", "Cardinals", "Orioles", "Blue Jays", "Sharks",
+    "Barracudas", "Stingrays", "Orcas", "Marlins", "Piranhas", "Cobras", "Vipers", "Rattlers", "Scorpions", "Hornets",
+    "Wasps", "Yellowjackets", "Monarchs", "Royals", "Dukes", "Generals", "Sentinels", "Guardians", "Aces", "Jets",
+)
+CITIES = (
+    "New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio", "San Diego",
+    "Dallas", "San Jose", "Newark", "Boston", "New Orleans", "Las Vegas", "Honolulu", "Detroit", "Anaheim",
+    "Milwaukee", "Seattle", "Indianapolis", "San Francisco", "Austin", "Portland", "Nashville", "El Paso",
+    "Denver", "Fort Worth", "Jacksonville", "Charlotte", "Oklahoma City", "Washington", "Sacramento",
+    "Baltimore", "Atlanta", "Memphis", "Orlando", "Miami", "Columbus", "Louisville", "Albuquerque", "Tucson",
+    "Fresno", "Mesa", "Kansas City", "Omaha", "Colorado Springs", "Raleigh", "Long Beach", "Virginia Beach",
+    "Oakland", "Minneapolis", "Tulsa", "Tampa", "Arlington", "Wichita", "Bakersfield", "Aurora", "Cleveland",
+    "Riverside", "Lexington", "Stockton", "Cincinnati", "St. Paul", "Pittsburgh", "Greensboro",
+    "Lincoln", "Plano", "Buffalo", "Henderson", "Fort Wayne", "Jersey City", "St. Louis", "Chula Vista",
+    "Norfolk", "Chandler", "Laredo", "Madison", "Durham", "Lubbock", "Winston-Salem", "Garland", "Glendale",
+    "Hialeah", "Reno", "Baton Rouge", "Irvine", "Chesapeake", "Irving", "Scottsdale", "Spokane", "Fremont",
+    "San Bernardino", "Boise", "Birmingham", "Rochester", "Richmond", "Des Moines", "Salt Lake City", "Tacoma",
+    "Anchorage", "Providence", "Hartford", "Knoxville", "Savannah", "Charleston", "Little Rock", "Albany",
+)
+PLAYER_FIRST_NAMES = (
+    "John", "Mikey", "Chris", "Jared", "Alex", "Arnold", "Robert", "Anthony", "Marko", "David",
+    "Michael", "James", "Daniel", "Matthew", "Joseph", "Joshua", "Andrew", "Justin", "Kevin", "Ryan",
+    "Jacob", "Ethan", "Tyler", "Brandon", "Nicholas", "Zachary", "Adam", "Nathan", "Eric", "Sean",
+    "Cameron", "Aaron", "Kyle", "Jason", "Brian", "Logan", "Jeffrey", "Samuel", "Austin", "Jonathan",
+    "Christian", "Gregory", "Patrick", "Peter", "Scott", "Lucas", "Dylan", "Paul", "Evan", "Trevor",
+    "Steven", "Blake", "Shane", "Colin", "Bradley", "Mitchell", "Cody", "Hunter", "Jordan", "Spencer",
+    "Luke", "Gavin", "Tyson", "Elijah", "Isaac", "Chase", "Vincent", "Marcus", "Tristan", "Grant",
+    "Cole", "Dominic", "Brent", "Wesley", "Maxwell", "Jack", "Phillip", "Owen", "Damian", "Tanner",
+    "Andre", "Malik", "Darius", "Jamal", "Terrence", "Devin", "Jalen", "Trey", "Derrick", "Reggie",
+    "Carlos", "Luis", "Miguel", "Javier", "Diego", "Mateo", "Rafael", "Sergio", "Victor", "Hector",
+    "Giannis", "Luka", "Nikola", "Goran", "Dirk", "Tony", "Manu", "Pau", "Yao", "Hakeem",
+    "Kobe", "Shaquille", "Dwyane", "Russell", "Kareem", "Wilt", "Larry", "Magic", "Scottie", "Dennis",
+    "Isaiah", "Caleb", "Noah", "Liam", "Mason", "Aiden", "Carter", "Landon", "Wyatt", "Julian",
+    "Xavier", "Zion", "Ja", "Trae", "Desmond", "Donovan", "Jayson", "Jaylen", "Bam", "Kawhi",
+    "Rudy", "Klay", "Draymond", "Stephen", "Kyrie", "Dejounte", "Brook", "Tobias", "Jrue", "Khris",
+)
+PLAYER_LAST_NAMES = (
+    "White", "Johnson", "Brown", "Taylor", "Anderson", "Lee", "Clark", "Walker", "Robinson", "Lewis",
+    "Harris", "Young", "Allen", "King", "Wright", "Scott", "Green", "Baker", "Adams", "Nelson",
+    "Carter", "Mitchell", "Perez", "Roberts", "Turner", "Phillips", "Campbell", "Parker", "Evans", "Edwards",
+    "Collins", "Stewart", "Morris", "Rodriguez", "Reed", "Cook", "Morgan", "Bell", "Murphy", "Bailey",
+    "Rivera", "Cooper", "Richardson", "Cox", "Howard", "Ward", "Torres", "Peterson", "Gray", "Ramirez",
+    "James", "Watson", "Brooks", "Kelly", "Sanders", "Price", "Bennett", "Wood", "Barnes", "Ross",
+    "Henderson", "Coleman", "Jenkins", "Perry", "Powell", "Long", "Patterson", "Hughes", "Flores", "Washington",
+    "Butler", "Simmons", "Foster", "Gonzalez", "Bryant", "Alexander", "Russell", "Griffin", "Diaz", "Hayes",
+    "Myers", "Ford", "Hamilton", "Graham", "Sullivan", "Wallace", "Woods", "Cole", "West", "Jordan",
+    "Owens", "Reynolds", "Fisher", "Ellis", "Harrison", "Gibson", "Mcdonald", "Cruz", "Marshall", "Ortiz",
+    "Gomez", "Murray", "Freeman", "Wells", "Webb", "Simpson", "Stevens", "Tucker", "Porter", "Hunter",
+    "Hicks", "Crawford", "Henry", "Boyd", "Mason", "Morales", "Kennedy", "Warren", "Dixon", "Ramos",
+    "Reyes", "Burns", "Gordon", "Shaw", "Holmes", "Rice", "Robertson", "Hunt", "Black", "Daniels",
+    "Palmer", "Mills", "Nichols", "Grant", "Knight", "Ferguson", "Rose", "Stone", "Hawkins", "Dunn",
+    "Perkins", "Hudson", "Spencer", "Gardner", "Stephens", "Payne", "Pierce", "Berry", "Matthews", "Arnold",
+)
+
+#suffixes added once every combination of a pool has been used, the first pass has no suffix
+PLAYER_SUFFIXES = ("", " Jr.", " Sr.")
+
+
+def roman_numeral(number):
+    '''returns the roman numeral of a positive number, used to tell apart teams and players that would
+    otherwise share a name'''
+
+    numerals = [
+        (1000, 'M'), (900, 'CM'), (500, 'D'), (400, 'CD'), (100, 'C'), (90, 'XC'),
+        (50, 'L'), (40, 'XL'), (10, 'X'), (9, 'IX'), (5, 'V'), (4, 'IV'), (1, 'I'),
+    ]
+    result = ''
+    for value, numeral in numerals:
+        count, number = divmod(number, value)
+        result += numeral * count
+    return result
+
+
+def name_suffix(suffixes, repeat):
+    '''suffix for the given pass over a name space - the listed suffixes first, then roman numerals'''
+
+    if repeat < len(suffixes):
+        return suffixes[repeat]
+    return f" {roman_numeral(repeat - len(suffixes) + 2)}"
+
+
+def unique_indices(space, count, rng):
+    '''draws count indices from range(space) in random order - a fresh permutation is used for every pass
+    over the space, so an index only repeats in a later pass and the pass number tells the repeats apart.
+    returns the index and pass number arrays'''
+
+    passes = max(1, -(-count // space))
+    indices = np.concatenate([rng.permutation(space) for _ in range(passes)])[:count]
+    return indices, np.arange(count) // space
+
+
+def team_names(count, rng):
+    '''returns count unique (city, name) pairs - nicknames are never repeated until all of them are used,
+    after that they get a numeral, cities are spread evenly over the teams'''
+
+    names, repeats = unique_indices(len(TEAM_NAMES), count, rng)
+    cities, _ = unique_indices(len(CITIES), count, rng)
+
+    return [
+        (CITIES[city], TEAM_NAMES[name] + name_suffix(("",), repeat))
+        for city, name, repeat in zip(cities.tolist(), names.tolist(), repeats.tolist())
+    ]
+
+
+def player_names(count, rng):
+    '''returns count unique (first, last) name pairs - every full name is sampled from the product of the
+    first and last name pools without replacement, suffixes are added once the product is used up'''
+
+    num_last_names = len(PLAYER_LAST_NAMES)
+    combinations, repeats = unique_indices(len(PLAYER_FIRST_NAMES) * num_last_names, count, rng)
+
+    return [
+        (PLAYER_FIRST_NAMES[combination // num_last_names],
+         PLAYER_LAST_NAMES[combination % num_last_names] + name_suffix(PLAYER_SUFFIXES, repeat))
+        for combination, repeat in zip(combinations.tolist(), repeats.tolist())
+    ]
@@ -0,0 +1,56 @@
+#Hinsley Casenet - U59220930
+#project/pagination.py - keyset pagination of the game log, newest games first, on (date, id)
+
+import datetime
+
+from django.db.models import Q
+
+GAMES_PER_PAGE = 50
+
+
+def encode_cursor(game):
+    '''cursor pointing just after the given game, as "<date>.<id>"'''
+
+    return f'{game.date.isoformat()}.{game.pk}'
+
+
+def decode_cursor(cursor):
+    '''returns the (date, id) of a cursor, raises ValueError when the cursor is not valid'''
+
+    date, _, pk = cursor.partition('.')
+    return datetime.date.fromisoformat(date), int(pk)
+
+
+def page_query(games, cursor=None, size=GAMES_PER_PAGE):
+    '''the games of a page, newest first, and one more - raises ValueError when the cursor is not valid'''
+
+    games = games.order_by('-date', '-id')
+    if cursor:
+        date, pk = decode_cursor(cursor)
+        games = games.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+
+    #one extra row tells whether there is a next page
+    return games[:size + 1]
+
+
+def split_page(page, size=GAMES_PER_PAGE):
+    '''the games of a page read with page_query and the cursor of the next page, or None'''
+
+    if len(page) <= size:
+        return page, None
+    page = page[:size]
+    return page, encode_cursor(page[-1])
+
+
+def games_page(games, cursor=None, size=GAMES_PER_PAGE):
+    '''one page of the games queryset, newest first - returns the games and the cursor of the next page,
+    or None on the last page. the page starts right after the cursor, so every page costs the same
+    however deep into the log it is, and games written in between never shift a page'''
+
+    return split_page(list(page_query(games, cursor, size)), size)
+
+
+async def agames_page(games, cursor=None, size=GAMES_PER_PAGE):
+    '''games_page for async views'''
+
+    return split_page([game async for game in page_query(games, cursor, size)], size)
@@ -0,0 +1,164 @@
+#Hinsley Casenet - U59220930
+#project/projections.py - monte carlo season projections, runs thousands of seasons across a process pool
+
+import hashlib
+import multiprocessing
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .schedule import build_pairings
+from .simulation import PROJECTIONS_STREAM, SCORES_STREAM, SimulationError, rank_standings, simulate_many, stream
+
+#number of games (or team records) simulated per block, counted over all of its seasons - every block draws
+#from its own stream of the league seed, so the result does not depend on how the blocks are split between
+#workers. a block holds a handful of arrays of this many numbers, which bounds the memory of a worker to
+#about 50 MB whatever the size of the league
+BLOCK_ELEMENTS = 1_000_000
+
+#process pool shared by the projections of this process, see projection_pool
+_pool = None
+_pool_lock = threading.Lock()
+
+TeamProjection = namedtuple('TeamProjection', [
+    'team', 'expected_wins', 'average_place', 'first_place_chance', 'place_chances',
+])
+
+
+def run_trials(home, away, star_counts, blocks, seed):
+    '''worker entry point - simulates the (block, trials) pairs it was given and returns the (team, place)
+    histogram and the total wins of every team, only plain arrays cross the process boundary'''
+
+    num_teams = len(star_counts)
+    place_counts = np.zeros((num_teams, num_teams), dtype=np.int64)
+    total_wins = np.zeros(num_teams, dtype=np.int64)
+    team_offsets = np.arange(num_teams) * num_teams
+
+    for block, trials in blocks:
+        wins, losses = simulate_many(home, away, star_counts, trials, stream(seed, PROJECTIONS_STREAM, SCORES_STREAM, block))
+        places = rank_standings(wins, losses)
+
+        place_counts += np.bincount(
+            (team_offsets + places - 1).ravel(), minlength=num_teams * num_teams
+        ).reshape(num_teams, num_teams)
+        total_wins += wins.sum(axis=0)
+
+    return place_counts, total_wins
+
+
+def projection_cache_key(league, teams, trials):
+    '''cache key for a projection - it changes whenever the seed, the teams, their rosters or the season
+    length change'''
+
+    roster_signature = ','.join(f'{team.pk}:{team.star_count}' for team in teams)
+    digest = hashlib.sha1(f'{league.seed}|{league.num_games}|{trials}|{roster_signature}'.encode()).hexdigest()
+    return f'projection:{league.pk}:{digest}'
+
+
+def pool_context():
+    '''start method of the projection workers - forkserver starts them from a clean single threaded
+    process, a plain fork of a threaded asgi worker can copy a lock another thread holds and hang'''
+
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+def projection_pool():
+    '''the process pool of this web process, started on the first projection and kept for the next ones -
+    it has PROJECTION_WORKERS processes'''
+
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max(1, settings.PROJECTION_WORKERS), mp_context=pool_context())
+        return _pool
+
+
+def discard_projection_pool(pool):
+    '''drops a pool whose worker died, the next projection starts a new one'''
+
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def trials_per_block(num_games, num_teams):
+    '''number of seasons of num_games games between num_teams teams that fit in one block'''
+
+    return max(1, BLOCK_ELEMENTS // max(1, num_games, num_teams))
+
+
+def run_projection(home, away, star_counts, trials, workers, seed):
+    '''splits the trials into blocks over the process pool and merges the histograms of every worker'''
+
+    block_size = trials_per_block(len(home), len(star_counts))
+    blocks = [
+        (block, min(block_size, trials - start))
+        for block, start in enumerate(range(0, trials, block_size))
+    ]
+    workers = max(1, min(workers, len(blocks)))
+
+    if workers == 1:
+        return run_trials(home, away, star_counts, blocks, seed)
+
+    #the arrays are small so every worker gets its own copy, the workers never touch the db
+    pool = projection_pool()
+    try:
+        results = list(pool.map(
+            run_trials,
+            [home] * workers, [away] * workers, [star_counts] * workers,
+            [blocks[worker::workers] for worker in range(workers)], [seed] * workers,
+        ))
+    except BrokenProcessPool:
+        discard_projection_pool(pool)
+        raise
+
+    place_counts = sum(result[0] for result in results)
+    total_wins = sum(result[1] for result in results)
+    return place_counts, total_wins
+
+
+def project_season(league, trials=None, workers=None):
+    '''projects the league's season from the current rosters - returns one TeamProjection per team,
+    ordered by expected wins, results are cached until the rosters change'''
+
+    trials = trials or settings.PROJECTION_TRIALS
+    workers = workers or settings.PROJECTION_WORKERS
+
+    teams = list(league.team_set.order_by('id'))
+    num_teams = len(teams)
+
+    if num_teams < 2:
+        raise SimulationError("Not enough teams to project a season.")
+
+    key = projection_cache_key(league, teams, trials)
+    cached = cache.get(key)
+
+    if cached is None:
+        #the results do not depend on the dates, so the pairings are built once and shared by every trial
+        home, away, _ = build_pairings(num_teams, league.num_games)
+        star_counts = np.array([team.star_count for team in teams], dtype=np.int64)
+        cached = run_projection(home, away, star_counts, trials, workers, league.seed)
+        cache.set(key, cached, settings.PROJECTION_CACHE_TIMEOUT)
+
+    place_counts, total_wins = cached
+    place_chances = place_counts / trials
+
+    projections = [
+        TeamProjection(
+            team=team,
+            expected_wins=total_wins[index] / trials,
+            average_place=float(np.dot(place_chances[index], np.arange(1, num_teams + 1))),
+            first_place_chance=place_chances[index][0] * 100,
+            place_chances=(place_chances[index] * 100).tolist(),
+        )
+        for index, team in enumerate(teams)
+    ]
+    return sorted(projections, key=lambda projection: (-projection.expected_wins, projection.average_place))
@@ -0,0 +1,105 @@
+#Hinsley Casenet - U59220930
+#project/schedule.py - balanced round robin schedules built with the circle method, dated in a single pass
+
+import datetime
+
+import numpy as np
+
+#number of rest days a team gets between two games (inclusive)
+MIN_REST_DAYS = 2
+MAX_REST_DAYS = 3
+
+
+def round_robin_rounds(num_teams):
+    '''circle method - one round robin where every team meets every other team once, returned as a list
+    of rounds of (home, away) index pairs, with an odd number of teams one team sits out each round.
+    venues follow the berger tables - a pair is oriented by its place in the circle, which flips every
+    round as the teams move around it, and the game of the fixed slot by the round, so every team
+    alternates home and away apart from one break and ends the round robin at most one game off even'''
+
+    #a placeholder in the fixed slot gives odd leagues a bye, whoever is paired with it sits out that round
+    slots = ([None] if num_teams % 2 else []) + list(range(num_teams))
+    size = len(slots)
+    rounds = []
+
+    for round_number in range(size - 1):
+        pairs = []
+        for position in range(size // 2):
+            team1, team2 = slots[position], slots[size - 1 - position]
+            if team1 is None or team2 is None:
+                continue
+            swap = round_number % 2 if position == 0 else position % 2
+            pairs.append((team2, team1) if swap else (team1, team2))
+
+        rounds.append(pairs)
+
+        #keep the first slot fixed and rotate everyone else one place
+        slots = [slots[0], slots[-1]] + slots[1:-1]
+
+    return rounds
+
+
+def build_pairings(num_teams, num_games):
+    '''repeats the round robin until every team has num_games games - returns home, away and round index
+    arrays. every other repeat swaps all the venues, so teams that meet again play at the other ground and
+    home and away even out over two round robins'''
+
+    rounds = round_robin_rounds(num_teams)
+    games_played = [0] * num_teams
+    home, away, round_index = [], [], []
+    round_number = 0
+    cycle = 0
+
+    while min(games_played) < num_games:
+        scheduled = False
+
+        for pairs in rounds:
+            for team1, team2 in pairs:
+                if games_played[team1] >= num_games or games_played[team2] >= num_games:
+                    continue
+                if cycle % 2:
+                    team1, team2 = team2, team1
+
+                home.append(team1)
+                away.append(team2)
+                round_index.append(round_number)
+                games_played[team1] += 1
+                games_played[team2] += 1
+                scheduled = True
+
+            round_number += 1
+            if min(games_played) >= num_games:
+                break
+
+        cycle += 1
+        #an odd league with an odd number of games always leaves one team a game short
+        if not scheduled:
+            break
+
+    return np.array(home, dtype=np.intp), np.array(away, dtype=np.intp), np.array(round_index, dtype=np.intp)
+
+
+def pack_dates(home, away, round_index, num_teams, start_date, rng):
+    '''dates every game in one pass over the rounds - a game is played on the first day both teams are
+    rested and each team then rests 2-3 days, no team plays twice in a round so a round is one array step'''
+
+    next_day = np.zeros(num_teams, dtype=np.int64)
+    days = np.empty(len(home), dtype=np.int64)
+    gaps = rng.integers(MIN_REST_DAYS, MAX_REST_DAYS + 1, size=len(home))
+
+    bounds = [0] + (np.flatnonzero(np.diff(round_index)) + 1).tolist() + [len(home)]
+    for start, end in zip(bounds, bounds[1:]):
+        round_home, round_away = home[start:end], away[start:end]
+        day = np.maximum(next_day[round_home], next_day[round_away])
+        days[start:end] = day
+        next_day[round_home] = day + gaps[start:end]
+        next_day[round_away] = day + gaps[start:end]
+
+    return [start_date + datetime.timedelta(days=day) for day in days.tolist()]
+
+
+def build_schedule(num_teams, num_games, start_date, rng):
+    '''builds a balanced schedule where every team plays num_games games - returns home, away and date arrays'''
+
+    home, away, round_index = build_pairings(num_teams, num_games)
+    return home, away, pack_dates(home, away, round_index, num_teams, start_date, rng)
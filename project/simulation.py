@@ -0,0 +1,377 @@
+#Hinsley Casenet - U59220930
+#project/simulation.py - vectorized season engine, draws every game of a season at once using numpy arrays
+
+from collections import namedtuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .schedule import build_schedule
+
+#range of points a team can score before the star bonus is added (inclusive)
+MIN_POINTS = 70
+MAX_POINTS = 140
+
+#independent random streams derived from a league seed - the schedule, the scores, the generated
+#rosters and the projections each draw from their own stream so one never shifts another
+SCHEDULE_STREAM = 0
+SCORES_STREAM = 1
+ROSTERS_STREAM = 2
+PROJECTIONS_STREAM = 3
+
+class SimulationError(Exception):
+    '''raised when a league cannot be simulated with its current teams and settings'''
+
+
+def stream(seed, *key):
+    '''returns a generator for one independent stream of a league seed - the same seed and key always give
+    the same numbers, whichever process draws them (for example stream(seed, SCORES_STREAM, season))'''
+
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=key))
+
+
+SeasonResults = namedtuple('SeasonResults', [
+    'home', 'away', 'home_points', 'away_points', 'home_won',
+    'wins', 'losses', 'places',
+])
+
+
+def draw_scores(home_bonus, away_bonus, rng):
+    '''draws the points scored by each side of every game, the star bonus shifts the whole range up -
+    ties are broken by randomly giving one of the teams one more point'''
+
+    home_bonus = np.asarray(home_bonus, dtype=np.int64)
+    away_bonus = np.asarray(away_bonus, dtype=np.int64)
+
+    home_points = rng.integers(MIN_POINTS + home_bonus, MAX_POINTS + home_bonus + 1)
+    away_points = rng.integers(MIN_POINTS + away_bonus, MAX_POINTS + away_bonus + 1)
+
+    #anti tie logic - a coin flip decides who gets the extra point
+    ties = home_points == away_points
+    home_gets_point = rng.random(ties.shape) < 0.5
+    home_points = home_points + (ties & home_gets_point)
+    away_points = away_points + (ties & ~home_gets_point)
+
+    return home_points, away_points
+
+
+def rank_standings(wins, losses):
+    '''returns the 1-based place of every team, sorted by most wins then fewest losses -
+    ties keep the original team order, 2d arrays are ranked row by row (one row per season)'''
+
+    wins = np.asarray(wins)
+    losses = np.asarray(losses)
+
+    order = np.lexsort((losses, -wins), axis=-1)
+    places = np.empty(wins.shape, dtype=np.int64)
+    np.put_along_axis(places, order, np.broadcast_to(np.arange(1, wins.shape[-1] + 1), wins.shape), axis=-1)
+    return places
+
+
+def tally(home, away, home_won, num_teams):
+    '''counts the wins and losses of every team over a set of games'''
+
+    winners = np.where(home_won, home, away)
+    losers = np.where(home_won, away, home)
+    return np.bincount(winners, minlength=num_teams), np.bincount(losers, minlength=num_teams)
+
+
+def score_games(home, away, days, star_counts, seed, season):
+    '''draws the scores of a set of games - every game day draws from its own stream of the seed, so a day
+    has the same scores whether it is played on its own or with the rest of the season. games of the same
+    day must be given in schedule order'''
+
+    star_counts = np.asarray(star_counts, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    home_points = np.empty(len(home), dtype=np.int64)
+    away_points = np.empty(len(home), dtype=np.int64)
+
+    #group the games by day, the stable sort keeps the schedule order inside a day
+    order = np.argsort(days, kind='stable')
+    sorted_days = days[order]
+    bounds = [0] + (np.flatnonzero(np.diff(sorted_days)) + 1).tolist() + [len(days)]
+
+    for start, end in zip(bounds, bounds[1:]):
+        games = order[start:end]
+        rng = stream(seed, SCORES_STREAM, season, int(sorted_days[start]))
+        home_points[games], away_points[games] = draw_scores(star_counts[home[games]], star_counts[away[games]], rng)
+
+    return home_points, away_points
+
+
+def simulate_season(home, away, days, star_counts, seed, season):
+    '''simulates every scheduled game at once - home and away are arrays of team indices into star_counts
+    and days holds the day of the season of every game (see game_days)'''
+
+    home_points, away_points = score_games(home, away, days, star_counts, seed, season)
+    home_won = home_points > away_points
+    wins, losses = tally(home, away, home_won, len(star_counts))
+
+    return SeasonResults(
+        home=home,
+        away=away,
+        home_points=home_points,
+        away_points=away_points,
+        home_won=home_won,
+        wins=wins,
+        losses=losses,
+        places=rank_standings(wins, losses),
+    )
+
+
+def simulate_many(home, away, star_counts, trials, rng):
+    '''simulates the same schedule trials times at once - returns (trials, teams) arrays of wins and losses'''
+
+    star_counts = np.asarray(star_counts, dtype=np.int64)
+    num_teams = len(star_counts)
+    shape = (trials, len(home))
+
+    home_points, away_points = draw_scores(
+        np.broadcast_to(star_counts[home], shape), np.broadcast_to(star_counts[away], shape), rng
+    )
+    home_won = home_points > away_points
+
+    #offset every season's team indices so that a single bincount covers all of them
+    offsets = np.arange(trials)[:, None] * num_teams
+    winners = np.where(home_won, home, away) + offsets
+    losers = np.where(home_won, away, home) + offsets
+    wins = np.bincount(winners.ravel(), minlength=trials * num_teams).reshape(trials, num_teams)
+    losses = np.bincount(losers.ravel(), minlength=trials * num_teams).reshape(trials, num_teams)
+
+    return wins, losses
+
+
+def game_days(dates, first_date):
+    '''day of the season of every game date, counted from the first game day of the season (day 0) - it
+    picks the stream the scores of the day are drawn from, so the scores do not depend on the calendar
+    date the schedule was built on'''
+
+    return np.array([(game_date - first_date).days for game_date in dates], dtype=np.int64)
+
+
+def load_schedule(league, teams):
+    '''returns the stored schedule of the league as home/away team index arrays and dates, or None when it
+    has to be built (nothing is stored yet or it refers to teams that are no longer in the league)'''
+
+    from .models import Game
+
+    index_of = {team.pk: index for index, team in enumerate(teams)}
+    stored = list(Game.objects.filter(league=league).order_by('id').values_list('team1_id', 'team2_id', 'date'))
+
+    if not stored or any(team1 not in index_of or team2 not in index_of for team1, team2, _ in stored):
+        return None
+
+    home = np.array([index_of[team1] for team1, _, _ in stored], dtype=np.intp)
+    away = np.array([index_of[team2] for _, team2, _ in stored], dtype=np.intp)
+    return home, away, [game_date for _, _, game_date in stored]
+
+
+def clear_schedule(league):
+    '''removes the stored schedule (and its games) so the next simulation builds a new one, the standings
+    are recounted without them'''
+
+    from .models import Game
+    from .standings import rebuild_standings
+
+    with transaction.atomic():
+        Game.objects.filter(league=league).delete()
+        rebuild_standings(league)
+
+
+def prepare_season(league, report):
+    '''checks the league can be simulated and returns its teams and schedule, the schedule is built once per
+    league from its own stream and stored with the games, later seasons reuse it'''
+
+    #star counts are stored on the teams so the engine never goes back to the db
+    teams = list(league.team_set.order_by('id'))
+    num_teams = len(teams)
+    max_games = league.num_games
+
+    #this should not be a problem because the league form error checks for this
+    if num_teams < 2:
+        raise SimulationError("Not enough teams to simulate games.")
+
+    #same as above
+    if max_games < num_teams - 1:
+        raise SimulationError(f"Number of games per team must be at least {num_teams - 1} to ensure each team plays every other team at least once.")
+
+    report(10, "Loading schedule")
+    schedule = load_schedule(league, teams)
+    if schedule is None:
+        report(20, "Building schedule")
+        schedule = build_schedule(num_teams, max_games, timezone.now().date(), stream(league.seed, SCHEDULE_STREAM))
+
+    return teams, schedule
+
+
+def save_season(league, teams, games, season, records):
+    '''writes a season in a single transaction - the old games are replaced, the new games are bulk inserted
+    and the standings are rewritten from the records, so a failure never leaves half a season behind. a
+    stored schedule is rewritten the same way since a bulk insert is far cheaper than a bulk update'''
+
+    from .models import Game, League
+    from .standings import save_standings
+
+    with transaction.atomic():
+        Game.objects.filter(league=league).delete()
+        Game.objects.bulk_create(games)
+        save_standings(league, teams, records)
+        League.objects.filter(pk=league.pk).update(num_teams=len(teams), season=season)
+
+    #the league in memory only moves on once the season is committed, so a write retried after a lock
+    #error replays the same season
+    league.num_teams, league.season = len(teams), season
+    return games
+
+
+def start_season(league, season=None, progress=None):
+    '''sets up the next season without playing it - every game of the schedule is stored unplayed and the
+    team records are reset, games are then played with play_games'''
+
+    from .models import Game
+    from .standings import empty_records
+
+    report = progress_reporter(progress)
+    if season is None:
+        season = league.season + 1
+
+    teams, (home, away, dates) = prepare_season(league, report)
+
+    games = [
+        Game(league=league, team1=teams[home[index]], team2=teams[away[index]], date=game_date)
+        for index, game_date in enumerate(dates)
+    ]
+
+    report(70, "Saving schedule")
+    save_season(league, teams, games, season, empty_records(len(teams)))
+
+    report(100, "Done")
+    return games
+
+
+def simulate_league(league, season=None, progress=None):
+    '''simulates a full season for the league and writes it to the db - the season number picks the random
+    streams, so replaying a season of the same seed gives the same schedule and scores, by default the
+    next season is simulated. progress(percent, message) is called between the steps so that callers
+    running in the background can report on the run'''
+
+    from .models import Game
+    from .standings import empty_records, record_games
+
+    report = progress_reporter(progress)
+    if season is None:
+        season = league.season + 1
+
+    teams, (home, away, dates) = prepare_season(league, report)
+
+    #the whole season is drawn at once by the engine, the db is only written once the results are known
+    report(40, "Simulating games")
+    star_counts = [team.star_count for team in teams]
+    results = simulate_season(home, away, game_days(dates, min(dates)), star_counts, league.seed, season)
+
+    games = []
+    for index, game_date in enumerate(dates):
+        team1 = teams[home[index]]
+        team2 = teams[away[index]]
+        games.append(Game(
+            league=league,
+            team1=team1,
+            team2=team2,
+            date=game_date,
+            points_scored_team1=int(results.home_points[index]),
+            points_scored_team2=int(results.away_points[index]),
+            winner=team1 if results.home_won[index] else team2,
+            played=True,
+        ))
+
+    #the standings are counted from the new season, every game of a team is in date order in the schedule
+    records = record_games(empty_records(len(teams)), home, away, results.home_points, results.away_points)
+
+    #the old season is replaced and the new one written in one transaction
+    report(70, "Saving results")
+    save_season(league, teams, games, season, records)
+
+    report(100, "Done")
+    return games
+
+
+def play_games(league, through=None, progress=None):
+    '''plays the pending games of the current season up to and including the date through (all of them
+    by default) and updates the standings incrementally - only the games being played are read and
+    written, the scores match what a full simulation of the season would give'''
+
+    from .models import Game
+    from .standings import load_records, record_games, records_from_games, save_standings
+
+    report = progress_reporter(progress)
+
+    pending = Game.objects.filter(league=league, played=False)
+    if through is not None:
+        pending = pending.filter(date__lte=through)
+
+    report(10, "Loading games")
+    games = list(pending.order_by('id'))
+    if not games:
+        raise SimulationError("There are no scheduled games left to play.")
+
+    teams = list(league.team_set.order_by('id'))
+    index_of = {team.pk: index for index, team in enumerate(teams)}
+    home = np.array([index_of[game.team1_id] for game in games], dtype=np.intp)
+    away = np.array([index_of[game.team2_id] for game in games], dtype=np.intp)
+
+    #the days are counted from the first game day of the whole season, played or not
+    first_date = Game.objects.filter(league=league).aggregate(first_date=Min('date'))['first_date']
+
+    report(40, "Simulating games")
+    star_counts = [team.star_count for team in teams]
+    home_points, away_points = score_games(
+        home, away, game_days([game.date for game in games], first_date), star_counts, league.seed, league.season
+    )
+    home_won = home_points > away_points
+
+    for index, game in enumerate(games):
+        game.points_scored_team1 = int(home_points[index])
+        game.points_scored_team2 = int(away_points[index])
+        game.winner = teams[home[index]] if home_won[index] else teams[away[index]]
+        game.played = True
+
+    #the standings only move by the games just played, they are counted from the games when missing
+    records = load_records(league, teams)
+    if records is None:
+        records = records_from_games(league, teams)
+    records = record_games(records, home, away, home_points, away_points)
+
+    #the played games are written back under the same ids - replacing the rows is far cheaper than a
+    #bulk update on sqlite
+    report(70, "Saving results")
+    with transaction.atomic():
+        pending.delete()
+        Game.objects.bulk_create(games)
+        save_standings(league, teams, records)
+
+    report(100, "Done")
+    return games
+
+
+def simulate_next_day(league, progress=None):
+    '''plays every game of the next scheduled day of the current season'''
+
+    from .models import Game
+
+    next_date = Game.objects.filter(league=league, played=False).aggregate(next_date=Min('date'))['next_date']
+    if next_date is None:
+        raise SimulationError("There are no scheduled games left to play.")
+
+    return play_games(league, through=next_date, progress=progress)
+
+
+def progress_reporter(progress):
+    '''wraps the optional progress(percent, message) callback so the steps can always report'''
+
+    def report(percent, message):
+        if progress is not None:
+            progress(percent, message)
+
+    return report
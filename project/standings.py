@@ -0,0 +1,206 @@
+#Hinsley Casenet - U59220930
+#project/standings.py - materialized league standings, moved forward by the games as they are recorded
+
+from collections import namedtuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField
+
+from .concurrency import retry_on_lock
+from .simulation import rank_standings, tally
+
+#running totals of every team, as arrays indexed like the teams of the league (ordered by id)
+Records = namedtuple('Records', ['wins', 'losses', 'points_for', 'points_against', 'streak'])
+
+
+def empty_records(num_teams):
+    '''records of teams that have not played yet'''
+
+    return Records(*(np.zeros(num_teams, dtype=np.int64) for _ in Records._fields))
+
+
+def record_games(records, home, away, home_points, away_points):
+    '''adds a set of games to the records - games have to be given in the order they were played, at least
+    for each team, so the streaks come out right. returns the updated records'''
+
+    home = np.asarray(home, dtype=np.intp)
+    away = np.asarray(away, dtype=np.intp)
+    home_points = np.asarray(home_points, dtype=np.int64)
+    away_points = np.asarray(away_points, dtype=np.int64)
+    num_teams = len(records.wins)
+
+    home_won = home_points > away_points
+    wins, losses = tally(home, away, home_won, num_teams)
+    points_for = np.bincount(home, home_points, num_teams) + np.bincount(away, away_points, num_teams)
+    points_against = np.bincount(home, away_points, num_teams) + np.bincount(away, home_points, num_teams)
+
+    #a streak counts up while the results repeat, positive for wins and negative for losses
+    streak = records.streak.tolist()
+    for winner, loser in zip(np.where(home_won, home, away).tolist(), np.where(home_won, away, home).tolist()):
+        streak[winner] = streak[winner] + 1 if streak[winner] > 0 else 1
+        streak[loser] = streak[loser] - 1 if streak[loser] < 0 else -1
+
+    return Records(
+        wins=records.wins + wins,
+        losses=records.losses + losses,
+        points_for=records.points_for + points_for.astype(np.int64),
+        points_against=records.points_against + points_against.astype(np.int64),
+        streak=np.array(streak, dtype=np.int64),
+    )
+
+
+def standings_table(records):
+    '''field values of the standings row of every team - the places are ranked the same way as the engine,
+    games back are counted from the first place team'''
+
+    if not len(records.wins):
+        return []
+
+    places = rank_standings(records.wins, records.losses)
+    games = records.wins + records.losses
+    win_pct = np.divide(records.wins, games, out=np.zeros(len(games)), where=games > 0)
+
+    leader = int(np.argmin(places))
+    games_back = ((records.wins[leader] - records.wins) + (records.losses - records.losses[leader])) / 2
+
+    return [
+        {
+            'place': int(places[index]),
+            'wins': int(records.wins[index]),
+            'losses': int(records.losses[index]),
+            'win_pct': float(win_pct[index]),
+            'games_back': float(games_back[index]),
+            'points_for': int(records.points_for[index]),
+            'points_against': int(records.points_against[index]),
+            'streak': int(records.streak[index]),
+        }
+        for index in range(len(places))
+    ]
+
+
+#fields of a standings row that are counted from the games
+STANDING_FIELDS = ['place', 'wins', 'losses', 'win_pct', 'games_back', 'points_for', 'points_against', 'streak']
+
+
+def build_standings(league, teams, records):
+    '''unsaved standings rows of the league, in the order of the teams'''
+
+    from .models import Standing
+
+    return [Standing(league=league, team=team, **row) for team, row in zip(teams, standings_table(records))]
+
+
+def save_standings(league, teams, records):
+    '''replaces the standings rows of the league and copies the record and place onto the teams - has to
+    run in the same transaction as the games it was computed from'''
+
+    from .models import Standing, Team
+
+    standings = build_standings(league, teams, records)
+    for team, standing in zip(teams, standings):
+        team.wins, team.losses, team.place_in_standings = standing.wins, standing.losses, standing.place
+
+    Standing.objects.filter(league=league).delete()
+    Standing.objects.bulk_create(standings)
+    Team.objects.bulk_update(teams, ['wins', 'losses', 'place_in_standings'])
+
+    #every write of game results goes through here, so this is where the cached pages and stats of the
+    #league are retired - in the same transaction, readers keep the old version until the games commit
+    league.bump_data_version()
+    return standings
+
+
+def load_records(league, teams):
+    '''records of the teams as stored in the standings, or None when a team has no standings row'''
+
+    from .models import Standing
+
+    stored = {standing.team_id: standing for standing in Standing.objects.filter(league=league)}
+    if any(team.pk not in stored for team in teams):
+        return None
+
+    rows = [stored[team.pk] for team in teams]
+    return Records(*(np.array([getattr(row, field) for row in rows], dtype=np.int64) for field in Records._fields))
+
+
+def records_from_games(league, teams):
+    '''records of the teams counted from the played games of the league'''
+
+    from .models import Game
+
+    index_of = {team.pk: index for index, team in enumerate(teams)}
+    played = list(
+        Game.objects.filter(league=league, played=True).order_by('date', 'id')
+        .values_list('team1_id', 'team2_id', 'points_scored_team1', 'points_scored_team2')
+    )
+    return record_games(
+        empty_records(len(teams)),
+        [index_of[game[0]] for game in played], [index_of[game[1]] for game in played],
+        [game[2] for game in played], [game[3] for game in played],
+    )
+
+
+def record_game(game):
+    '''moves the standings of the league forward by one game that was just played and saved - only the rows
+    of its two teams are rewritten, the other teams are only written when their place changed (and their
+    games back when the first place team played). has to run in the same transaction as the save'''
+
+    from .models import Standing, Team
+
+    league = game.league
+    team_ids = list(Team.objects.filter(league=league).order_by('id').values_list('id', flat=True))
+    rows = {row.team_id: row for row in Standing.objects.filter(league=league)}
+
+    #without stored standings they are counted from the games, which already include this one
+    if any(team_id not in rows for team_id in team_ids):
+        teams = list(league.team_set.order_by('id'))
+        return save_standings(league, teams, records_from_games(league, teams))
+
+    ordered = [rows[team_id] for team_id in team_ids]
+    home, away = rows[game.team1_id], rows[game.team2_id]
+    first_place = min(ordered, key=lambda row: row.place)
+
+    #same rules as record_games
+    home_points, away_points = game.points_scored_team1, game.points_scored_team2
+    winner, loser = (home, away) if home_points > away_points else (away, home)
+    winner.wins += 1
+    loser.losses += 1
+    winner.streak = winner.streak + 1 if winner.streak > 0 else 1
+    loser.streak = loser.streak - 1 if loser.streak < 0 else -1
+    home.points_for, home.points_against = home.points_for + home_points, home.points_against + away_points
+    away.points_for, away.points_against = away.points_for + away_points, away.points_against + home_points
+
+    places = rank_standings([row.wins for row in ordered], [row.losses for row in ordered]).tolist()
+    moved = [row for row, place in zip(ordered, places) if row.place != place]
+    for row, place in zip(ordered, places):
+        row.place = place
+    leader = ordered[places.index(1)]
+
+    for row in (home, away):
+        row.win_pct = row.wins / (row.wins + row.losses)
+        row.games_back = ((leader.wins - row.wins) + (row.losses - leader.losses)) / 2
+        Standing.objects.filter(pk=row.pk).update(**{field: getattr(row, field) for field in STANDING_FIELDS})
+        Team.objects.filter(pk=row.team_id).update(wins=row.wins, losses=row.losses, place_in_standings=row.place)
+
+    for row in moved:
+        if row not in (home, away):
+            Standing.objects.filter(pk=row.pk).update(place=row.place)
+            Team.objects.filter(pk=row.team_id).update(place_in_standings=row.place)
+
+    #games back are counted from the first place team, the other teams only move when its record did
+    if leader in (home, away) or leader is not first_place:
+        Standing.objects.filter(league=league).exclude(pk__in=[home.pk, away.pk]).update(games_back=ExpressionWrapper(
+            (leader.wins - F('wins') + F('losses') - leader.losses) / 2.0, output_field=FloatField()
+        ))
+
+    league.bump_data_version()
+
+
+@retry_on_lock
+def rebuild_standings(league):
+    '''recounts the standings of the league from its games, used after a game is edited by hand'''
+
+    teams = list(league.team_set.order_by('id'))
+    with transaction.atomic():
+        return save_standings(league, teams, records_from_games(league, teams))
@@ -0,0 +1,195 @@
+#Hinsley Casenet - U59220930
+#project/stats.py - team and head to head statistics, counted with grouped queries in the db and cached
+#until the league's data version changes
+
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+
+from .caching import league_cache_key
+
+TeamStats = namedtuple('TeamStats', [
+    'games', 'wins', 'losses', 'home_wins', 'home_losses', 'away_wins', 'away_losses',
+    'points_for', 'points_against', 'average_for', 'average_against', 'average_margin',
+])
+
+HeadToHead = namedtuple('HeadToHead', [
+    'opponent_id', 'opponent', 'games', 'wins', 'losses', 'points_for', 'points_against', 'average_margin',
+])
+
+HOME_WON = Q(points_scored_team1__gt=F('points_scored_team2'))
+AWAY_WON = Q(points_scored_team2__gt=F('points_scored_team1'))
+
+
+def cached(key, compute):
+    '''returns the cached value of key, computing and caching it when it is missing'''
+
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.STATS_CACHE_TIMEOUT)
+    return value
+
+
+async def acached(key, compute):
+    '''cached for async views - compute returns an awaitable'''
+
+    value = await cache.aget(key)
+    if value is None:
+        value = await compute()
+        await cache.aset(key, value, settings.STATS_CACHE_TIMEOUT)
+    return value
+
+
+def average(total, count):
+    '''average that is 0 before the first game'''
+
+    return total / count if count else 0.0
+
+
+def team_stats_queries(league):
+    '''one grouped query over the home games and one over the away games of the league'''
+
+    from .models import Game
+
+    played = Game.objects.filter(league=league, played=True)
+    home = played.values('team1').order_by().annotate(
+        games=Count('id'), wins=Count('id', filter=HOME_WON),
+        scored=Sum('points_scored_team1'), allowed=Sum('points_scored_team2'),
+    )
+    away = played.values('team2').order_by().annotate(
+        games=Count('id'), wins=Count('id', filter=AWAY_WON),
+        scored=Sum('points_scored_team2'), allowed=Sum('points_scored_team1'),
+    )
+    return home, away
+
+
+def fold_team_stats(home_rows, away_rows):
+    '''stats of every team from the rows of the home and away queries'''
+
+    home = {row['team1']: row for row in home_rows}
+    away = {row['team2']: row for row in away_rows}
+
+    empty = {'games': 0, 'wins': 0, 'scored': 0, 'allowed': 0}
+    stats = {}
+    for team_id in home.keys() | away.keys():
+        at_home, on_road = home.get(team_id, empty), away.get(team_id, empty)
+        games = at_home['games'] + on_road['games']
+        wins = at_home['wins'] + on_road['wins']
+        points_for = at_home['scored'] + on_road['scored']
+        points_against = at_home['allowed'] + on_road['allowed']
+
+        stats[team_id] = TeamStats(
+            games=games,
+            wins=wins,
+            losses=games - wins,
+            home_wins=at_home['wins'],
+            home_losses=at_home['games'] - at_home['wins'],
+            away_wins=on_road['wins'],
+            away_losses=on_road['games'] - on_road['wins'],
+            points_for=points_for,
+            points_against=points_against,
+            average_for=average(points_for, games),
+            average_against=average(points_against, games),
+            average_margin=average(points_for - points_against, games),
+        )
+    return stats
+
+
+def compute_team_stats(league):
+    '''stats of every team of the league that has played, by team id'''
+
+    home, away = team_stats_queries(league)
+    return fold_team_stats(home, away)
+
+
+async def acompute_team_stats(league):
+    '''compute_team_stats with the async orm'''
+
+    home, away = team_stats_queries(league)
+    return fold_team_stats([row async for row in home], [row async for row in away])
+
+
+def head_to_head_query(team):
+    '''one query grouped by the pair of teams over the games of the team'''
+
+    from .models import Game
+
+    return Game.objects.filter(Q(team1=team) | Q(team2=team), played=True).values(
+        'team1', 'team2', 'team1__city', 'team1__name', 'team2__city', 'team2__name',
+    ).order_by().annotate(
+        games=Count('id'), home_wins=Count('id', filter=HOME_WON),
+        home_points=Sum('points_scored_team1'), away_points=Sum('points_scored_team2'),
+    )
+
+
+def fold_head_to_head(team, rows):
+    '''record of the team against each opponent from the rows of head_to_head_query, both venues are
+    folded together'''
+
+    records = {}
+    for row in rows:
+        at_home = row['team1'] == team.pk
+        side = 'team2' if at_home else 'team1'
+        record = records.setdefault(row[side], {
+            'opponent': f"{row[side + '__city']} {row[side + '__name']}", 'games': 0, 'wins': 0, 'for': 0, 'against': 0,
+        })
+        record['games'] += row['games']
+        record['wins'] += row['home_wins'] if at_home else row['games'] - row['home_wins']
+        record['for'] += row['home_points'] if at_home else row['away_points']
+        record['against'] += row['away_points'] if at_home else row['home_points']
+
+    return sorted(
+        (
+            HeadToHead(
+                opponent_id=opponent_id,
+                opponent=record['opponent'],
+                games=record['games'],
+                wins=record['wins'],
+                losses=record['games'] - record['wins'],
+                points_for=record['for'],
+                points_against=record['against'],
+                average_margin=average(record['for'] - record['against'], record['games']),
+            )
+            for opponent_id, record in records.items()
+        ),
+        key=lambda record: record.opponent,
+    )
+
+
+def compute_head_to_head(team):
+    '''record of the team against each opponent, sorted by opponent name'''
+
+    return fold_head_to_head(team, head_to_head_query(team))
+
+
+async def acompute_head_to_head(team):
+    '''compute_head_to_head with the async orm'''
+
+    return fold_head_to_head(team, [row async for row in head_to_head_query(team)])
+
+
+def team_stats(league):
+    '''stats of every team of the league that has played, by team id - cached until the games change'''
+
+    return cached(league_cache_key(league, 'stats', 'teams'), lambda: compute_team_stats(league))
+
+
+def head_to_head(team):
+    '''record of the team against each opponent, sorted by opponent name - cached until the games change'''
+
+    return cached(league_cache_key(team.league, 'stats', 'head_to_head', team.pk), lambda: compute_head_to_head(team))
+
+
+async def ateam_stats(league):
+    '''team_stats for async views'''
+
+    return await acached(league_cache_key(league, 'stats', 'teams'), lambda: acompute_team_stats(league))
+
+
+async def ahead_to_head(team):
+    '''head_to_head for async views'''
+
+    return await acached(league_cache_key(team.league, 'stats', 'head_to_head', team.pk), lambda: acompute_head_to_head(team))
@@ -1,3 +1,1119 @@
-from django.test import TestCase
+#Hinsley Casenet - U59220930
+#project/tests.py - query budgets for the league pages and the performance benchmark of create / simulate / stats
 
-# Create your tests here.
+import datetime
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import unittest
+from contextlib import closing
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from .concurrency import LeagueBusy, league_lock, retry_on_lock
+from .generation import ROSTER_SIZE, build_league
+from .jobs import claim_next_job, enqueue_simulation, fail_stale_jobs, run_action, run_job
+from .models import Game, League, LeagueLock, Player, SimulationJob, Team
+from .names import roman_numeral
+from .pagination import GAMES_PER_PAGE
+from .projections import run_projection, run_trials, trials_per_block
+from .schedule import build_pairings
+from .simulation import MAX_POINTS, MIN_POINTS, draw_scores, rank_standings, score_games, simulate_league, simulate_many, simulate_next_day, simulate_season, start_season, tally
+from .standings import STANDING_FIELDS, rebuild_standings, records_from_games, standings_table
+from .stats import compute_team_stats, head_to_head, team_stats
+
+#smallest valid gif, used as the logo of the test leagues
+LOGO = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00'
+    b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+)
+
+#most queries a page may run - none of them depend on the size of the league, so a page that starts
+#running a query per team, player or game (n+1) goes over its budget on the bigger league
+QUERY_BUDGETS = {
+    'create': 15,
+    'simulate': 46,  #9 of them take and give back the league lock and look for jobs of dead workers, and
+                     #one per progress step renews the lock
+    'stats': 10,
+    'team_detail': 10,
+    'delete': 24,  #4 of them take and give back the league lock
+}
+
+#(teams, games) of the benchmarked leagues, BENCHMARK_SIZES="4x12,30x82" picks other sizes
+BENCHMARK_SIZES = [(4, 12), (30, 82), (100, 99), (500, 499)]
+
+
+def benchmark_sizes():
+    '''league sizes to benchmark, from BENCHMARK_SIZES when it is set'''
+
+    sizes = os.environ.get('BENCHMARK_SIZES')
+    if not sizes:
+        return BENCHMARK_SIZES
+    return [tuple(int(value) for value in size.split('x')) for size in sizes.split(',')]
+
+
+class LeagueTestMixin:
+    '''logs in a user and creates leagues through the pages, uploaded logos go to a temporary folder'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        #ids are handed out again after a test rolls back, so nothing cached for one test may leak into the next
+        cache.clear()
+        self.user = User.objects.create_user('coach', password='password')
+        self.client.force_login(self.user)
+
+    def create_league(self, num_teams, num_games, seed=1):
+        '''posts the league creation form - the first season is only queued, see run_jobs'''
+
+        return self.client.post(reverse('create_league'), {
+            'name': f'League {num_teams}', 'num_teams': num_teams, 'num_games': num_games, 'seed': seed,
+            'logo': SimpleUploadedFile('logo.gif', LOGO, content_type='image/gif'),
+        })
+
+    def simulate_league(self, league):
+        '''posts the simulate button of the management page'''
+
+        return self.client.post(reverse('simulate_league', args=[league.pk]), {'action': 'season'})
+
+    def run_jobs(self):
+        '''runs every queued simulation the way a worker would'''
+
+        while (job := claim_next_job()) is not None:
+            run_job(job)
+
+    def pages(self, league):
+        '''(name, method, url) of the benchmarked pages of a league'''
+
+        team = league.team_set.order_by('id').first()
+        return [
+            ('stats', 'get', reverse('league_stats', args=[league.pk])),
+            ('team_detail', 'get', reverse('team_detail', args=[league.pk, team.pk])),
+        ]
+
+
+class QueryBudgetTests(LeagueTestMixin, TestCase):
+    '''every page has to stay within its query budget for a small and a bigger league'''
+
+    SIZES = [(4, 6), (30, 30)]
+
+    def assertWithinBudget(self, name, queries):
+        self.assertLessEqual(
+            len(queries), QUERY_BUDGETS[name],
+            f"{name} ran {len(queries)} queries, its budget is {QUERY_BUDGETS[name]}:\n"
+            + "\n".join(query['sql'] for query in queries.captured_queries[:20]),
+        )
+
+    def test_create_league(self):
+        for num_teams, num_games in self.SIZES:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.create_league(num_teams, num_games)
+            self.assertEqual(response.status_code, 302)
+            self.assertWithinBudget('create', queries)
+
+    def test_simulate_league(self):
+        for num_teams, num_games in self.SIZES:
+            self.create_league(num_teams, num_games)
+            self.run_jobs()
+            league = League.objects.latest('id')
+
+            with CaptureQueriesContext(connection) as queries:
+                self.simulate_league(league)
+                self.run_jobs()
+            self.assertWithinBudget('simulate', queries)
+            self.assertEqual(league.team_set.filter(wins=0, losses=0).count(), 0)
+
+    def test_stats(self):
+        self.check_page_budget('stats')
+
+    def test_team_detail(self):
+        self.check_page_budget('team_detail')
+
+    def check_page_budget(self, page):
+        for num_teams, num_games in self.SIZES:
+            self.create_league(num_teams, num_games)
+            self.run_jobs()
+            league = League.objects.latest('id')
+            url = dict((name, url) for name, _, url in self.pages(league))[page]
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertWithinBudget(page, queries)
+
+    def test_delete_league(self):
+        for num_teams, num_games in self.SIZES:
+            self.create_league(num_teams, num_games)
+            self.run_jobs()
+            league = League.objects.latest('id')
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('league_delete', args=[league.pk]))
+            self.assertEqual(response.status_code, 302)
+            self.assertWithinBudget('delete', queries)
+            self.assertFalse(Team.objects.filter(league_id=league.pk).exists())
+
+
+class ReadViewQueryTests(LeagueTestMixin, TestCase):
+    '''the stats and team pages load everything they show in a fixed number of queries'''
+
+    def setUp(self):
+        super().setUp()
+        self.create_league(10, 12)
+        self.run_jobs()
+        self.league = League.objects.get()
+        self.team = self.league.team_set.order_by('id').first()
+
+    def test_stats(self):
+        #session, user, league, games with both teams, home and away team stats, standings
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('league_stats', args=[self.league.pk]))
+        self.assertEqual(len(response.context['games']), GAMES_PER_PAGE)
+        self.assertContains(response, str(self.team))
+
+        #the tables come from the cache after the first visit
+        with self.assertNumQueries(3):
+            cached = self.client.get(reverse('league_stats', args=[self.league.pk]))
+        self.assertEqual(cached.context['fragment'], response.context['fragment'])
+
+    def test_game_log_pages(self):
+        #the first page comes with the stats page, the rest through the load more endpoint
+        response = self.client.get(reverse('league_stats', args=[self.league.pk]))
+        pages, cursor = [response.context['games']], response.context['next_cursor']
+
+        while cursor:
+            with self.assertNumQueries(4):
+                page = self.client.get(reverse('league_games', args=[self.league.pk]), {'after': cursor}).json()
+            pages.append(page['html'].count('<tr>'))
+            cursor = page['next']
+
+        self.assertEqual([len(pages[0])] + pages[1:], [GAMES_PER_PAGE, 60 - GAMES_PER_PAGE])
+        keys = [(game.date, game.pk) for game in pages[0]]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('league_games', args=[self.league.pk]), {'after': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_stats_filtered_by_team(self):
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('league_stats', args=[self.league.pk]), {'team_name': self.team.name})
+        games = response.context['games']
+        self.assertEqual(len(games), 12)
+        self.assertTrue(all(self.team in (game.team1, game.team2) for game in games))
+
+    def test_team_detail(self):
+        #session, user, team with its league, home and away team stats, head to head, roster
+        with self.assertNumQueries(7):
+            response = self.client.get(reverse('team_detail', args=[self.league.pk, self.team.pk]))
+        self.assertEqual(len(response.context['roster']), 5)
+
+        with self.assertNumQueries(3):
+            self.client.get(reverse('team_detail', args=[self.league.pk, self.team.pk]))
+
+    def test_missing_objects_are_not_found(self):
+        self.assertEqual(self.client.get(reverse('league_stats', args=[self.league.pk + 1])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('league_teams', args=[self.league.pk + 1])).status_code, 404)
+        #a team is only found under its own league
+        self.assertEqual(self.client.get(reverse('team_detail', args=[self.league.pk + 1, self.team.pk])).status_code, 404)
+
+    def test_edits_retire_cached_pages(self):
+        url = reverse('team_detail', args=[self.league.pk, self.team.pk])
+        self.client.get(url)
+
+        self.client.post(reverse('update_team', args=[self.league.pk, self.team.pk]), {'name': 'Renamed', 'city': 'Town'})
+        self.assertContains(self.client.get(url), 'Town Renamed')
+
+        player = self.team.roster().first()
+        self.client.post(reverse('update_player', args=[self.league.pk, self.team.pk, player.pk]), {
+            'first_name': 'Edited', 'last_name': player.last_name, 'position': player.position, 'dob': player.dob,
+        })
+        self.assertContains(self.client.get(url), 'Edited')
+
+        self.league.refresh_from_db()
+        self.assertEqual(self.league.data_version, 3)  #the season, then the two edits
+
+
+class EngineTests(SimpleTestCase):
+    '''the vectorized engine scores whole seasons at once and keeps the records consistent'''
+
+    def setUp(self):
+        self.home, self.away, self.days = build_pairings(8, 14)
+        self.star_counts = np.array([0, 0, 1, 1, 2, 3, 4, 5], dtype=np.int64)
+
+    def test_scores_stay_in_range_and_never_tie(self):
+        bonus = np.repeat([0, 4], 5000)
+        home_points, away_points = draw_scores(bonus, bonus[::-1], np.random.default_rng(1))
+
+        self.assertFalse((home_points == away_points).any())
+        #the tie breaker can add one point on top of the range
+        self.assertTrue(((home_points >= MIN_POINTS + bonus) & (home_points <= MAX_POINTS + bonus + 1)).all())
+        self.assertTrue(((away_points >= MIN_POINTS + bonus[::-1]) & (away_points <= MAX_POINTS + bonus[::-1] + 1)).all())
+
+        #the star bonus shifts the whole range up
+        self.assertAlmostEqual(home_points[5000:].mean() - home_points[:5000].mean(), 4, delta=1)
+
+    def test_season_records_add_up(self):
+        results = simulate_season(self.home, self.away, self.days, self.star_counts, seed=3, season=1)
+
+        self.assertTrue((results.home_won == (results.home_points > results.away_points)).all())
+        self.assertEqual((results.wins + results.losses).tolist(), [14] * 8)
+        self.assertEqual(results.wins.sum(), len(self.home))
+        self.assertEqual(sorted(results.places.tolist()), list(range(1, 9)))
+
+        #better records are never placed behind worse ones
+        by_place = np.argsort(results.places)
+        self.assertTrue((np.diff(results.wins[by_place]) <= 0).all())
+
+    def test_a_day_is_scored_the_same_on_its_own(self):
+        home_points, away_points = score_games(self.home, self.away, self.days, self.star_counts, 3, 1)
+
+        day = self.days == self.days[len(self.days) // 2]
+        day_home, day_away = score_games(self.home[day], self.away[day], self.days[day], self.star_counts, 3, 1)
+        self.assertEqual(day_home.tolist(), home_points[day].tolist())
+        self.assertEqual(day_away.tolist(), away_points[day].tolist())
+
+    def test_many_seasons_at_once(self):
+        wins, losses = simulate_many(self.home, self.away, self.star_counts, 200, np.random.default_rng(2))
+
+        self.assertEqual(wins.shape, (200, 8))
+        self.assertTrue(((wins + losses) == 14).all())
+        #the team with the most stars wins more than the team without any
+        self.assertGreater(wins[:, 7].mean(), wins[:, 0].mean())
+
+    def test_ties_keep_the_team_order(self):
+        self.assertEqual(rank_standings([3, 5, 3, 3], [2, 0, 1, 2]).tolist(), [3, 1, 2, 4])
+        self.assertEqual(tally(np.array([0, 1]), np.array([1, 2]), np.array([True, False]), 3)[0].tolist(), [1, 0, 1])
+
+
+class GenerationTests(SimpleTestCase):
+    '''generated leagues never repeat a team or player name, however big they are'''
+
+    def test_large_league_names_are_unique(self):
+        #more teams than nicknames and more players than first and last name combinations
+        num_teams = 5000
+        teams, rosters = build_league(League(name='Big', num_teams=num_teams, num_games=num_teams - 1, seed=3))
+
+        self.assertEqual(len({team.name for team in teams}), num_teams)
+        self.assertEqual(len({(team.city, team.name) for team in teams}), num_teams)
+
+        players = [(player.first_name, player.last_name) for roster in rosters for player in roster]
+        self.assertEqual(len(players), num_teams * ROSTER_SIZE)
+        self.assertEqual(len(set(players)), len(players))
+
+    def test_numerals(self):
+        self.assertEqual([roman_numeral(number) for number in (1, 4, 9, 14, 40, 90, 400, 1994)],
+                         ['I', 'IV', 'IX', 'XIV', 'XL', 'XC', 'CD', 'MCMXCIV'])
+
+
+class ScheduleTests(SimpleTestCase):
+    '''the round robin pairs every team with every other team once per cycle and balances the venues'''
+
+    SIZES = [2, 3, 4, 5, 9, 10, 17, 30, 31]
+
+    def test_every_team_meets_every_other_team_once_per_cycle(self):
+        for num_teams in self.SIZES:
+            cycle = num_teams - 1
+            home, away, _ = build_pairings(num_teams, 2 * cycle)
+            games_per_cycle = num_teams * cycle // 2
+            for start in (0, games_per_cycle):
+                pairs = [frozenset(pair) for pair in zip(home[start:start + games_per_cycle].tolist(), away[start:start + games_per_cycle].tolist())]
+                self.assertEqual(len(set(pairs)), games_per_cycle, num_teams)
+
+            #the second meeting is at the other team's ground
+            self.assertEqual(sorted(zip(home.tolist(), away.tolist())), sorted(zip(away.tolist(), home.tolist())))
+
+    def test_home_and_away_are_balanced(self):
+        for num_teams in self.SIZES:
+            for num_games in range(num_teams - 1, 3 * num_teams):
+                home, away, _ = build_pairings(num_teams, num_games)
+                spread = np.abs(np.bincount(home, minlength=num_teams) - np.bincount(away, minlength=num_teams))
+                #at most one game off after a full round robin, two part way through one
+                self.assertLessEqual(spread.max(), 1 if num_games % (num_teams - 1) == 0 else 2, (num_teams, num_games))
+
+    def test_venues_alternate(self):
+        for num_teams in self.SIZES:
+            home, away, _ = build_pairings(num_teams, num_teams - 1)
+            for team in range(num_teams):
+                venues = ['H' if team == home_team else 'A' for home_team, away_team in zip(home, away) if team in (home_team, away_team)]
+                breaks = sum(first == second for first, second in zip(venues, venues[1:]))
+                self.assertLessEqual(breaks, 1, (num_teams, team, ''.join(venues)))
+
+
+class ProjectionTests(SimpleTestCase):
+    '''the projection histograms are merged from the worker processes without losing or changing a season'''
+
+    def setUp(self):
+        self.home, self.away, _ = build_pairings(6, 10)
+        self.star_counts = np.array([0, 1, 2, 3, 4, 5], dtype=np.int64)
+
+    def test_histograms_add_up_to_the_trials(self):
+        trials = 600
+        place_counts, total_wins = run_projection(self.home, self.away, self.star_counts, trials, 3, seed=7)
+
+        #every team finishes every season in one place, and every place is taken once per season
+        self.assertEqual(place_counts.sum(axis=1).tolist(), [trials] * 6)
+        self.assertEqual(place_counts.sum(axis=0).tolist(), [trials] * 6)
+        self.assertEqual(total_wins.sum(), trials * len(self.home))
+
+    #blocks of 100 seasons, so the trials are spread over several workers
+    @mock.patch('project.projections.BLOCK_ELEMENTS', 3000)
+    def test_results_do_not_depend_on_the_workers(self):
+        single = run_projection(self.home, self.away, self.star_counts, 1000, 1, seed=7)
+        for workers in (2, 3):
+            pooled = run_projection(self.home, self.away, self.star_counts, 1000, workers, seed=7)
+            np.testing.assert_array_equal(pooled[0], single[0])
+            np.testing.assert_array_equal(pooled[1], single[1])
+
+    def test_large_schedules_stay_within_the_block_memory(self):
+        home, away, _ = build_pairings(500, 82)
+        star_counts = np.arange(500, dtype=np.int64) % 6
+        trials = trials_per_block(len(home), 500)
+        self.assertLess(trials, 100)
+
+        #numpy reports its arrays to tracemalloc, one block should need about 50 MB
+        tracemalloc.start()
+        try:
+            place_counts, _ = run_trials(home, away, star_counts, [(0, trials), (1, trials)], seed=7)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(place_counts.sum(axis=0).tolist(), [2 * trials] * 500)
+        self.assertLess(peak, 100 * 1024 * 1024)
+
+
+class SeedTests(LeagueTestMixin, TestCase):
+    '''a league seed gives the same schedule and scores every time it is played'''
+
+    def play_first_season(self, seed, start):
+        '''creates a league and plays its first season with the schedule starting on the date start'''
+
+        self.create_league(6, 9, seed=seed)
+        league = League.objects.latest('id')
+        with mock.patch('project.simulation.timezone') as clock:
+            clock.now.return_value = datetime.datetime.combine(start, datetime.time(12), datetime.timezone.utc)
+            self.run_jobs()
+        league.refresh_from_db()
+        return league
+
+    def season(self, league):
+        '''the games of the league by day of the season, and the records of its teams in roster order'''
+
+        games = list(Game.objects.filter(league=league).order_by('id').values_list(
+            'date', 'team1__name', 'team2__name', 'points_scored_team1', 'points_scored_team2'
+        ))
+        first_date = games[0][0]
+        games = [((game_date - first_date).days, *rest) for game_date, *rest in games]
+        return games, list(league.standings.order_by('team_id').values_list('wins', 'losses', 'points_for'))
+
+    def test_same_seed_gives_the_same_season(self):
+        start = datetime.date(2026, 10, 18)
+        first = self.play_first_season(11, start)
+        second = self.play_first_season(11, start)
+        self.assertEqual(self.season(first), self.season(second))
+        self.assertNotEqual(self.season(self.play_first_season(12, start)), self.season(first))
+
+        #replaying a season of the league draws it again exactly, the next season is a new draw
+        first_season = self.season(first)
+        simulate_league(first, season=first.season)
+        self.assertEqual(self.season(first), first_season)
+        simulate_league(first)
+        self.assertNotEqual(self.season(first), first_season)
+
+    def test_single_games_are_played_from_the_seed(self):
+        league = self.play_first_season(seed=5, start=datetime.date(2024, 4, 1))
+        start_season(league, season=league.season)
+        games = list(Game.objects.filter(league=league).order_by('date', 'id')[:2])
+
+        def play(game):
+            '''plays the game from a fresh state and returns its scores'''
+
+            Game.objects.filter(pk=game.pk).update(points_scored_team1=0, points_scored_team2=0, winner=None, played=False)
+            game.refresh_from_db()
+            game.points_scored()
+            return game.points_scored_team1, game.points_scored_team2, game.winner_id
+
+        for game in games:
+            self.assertEqual(play(game), play(game))
+
+    def test_scores_do_not_depend_on_the_start_date(self):
+        first = self.play_first_season(5, datetime.date(2026, 10, 18))
+        second = self.play_first_season(5, datetime.date(2026, 10, 19))
+
+        self.assertEqual(Game.objects.filter(league=second).earliest('date').date, datetime.date(2026, 10, 19))
+        self.assertEqual(self.season(first), self.season(second))
+
+
+class StandingsTests(LeagueTestMixin, TestCase):
+    '''the standings are moved forward by the games and always match a recount of them'''
+
+    def standings(self, league):
+        return list(league.standings.order_by('team_id').values_list(
+            'team_id', 'place', 'wins', 'losses', 'win_pct', 'games_back', 'points_for', 'points_against', 'streak'
+        ))
+
+    def test_day_by_day_matches_full_season(self):
+        self.create_league(9, 20)
+        self.run_jobs()
+        league = League.objects.get()
+        full_season = self.standings(league)
+
+        start_season(league, season=league.season)
+        while Game.objects.filter(played=False).exists():
+            simulate_next_day(league)
+        self.assertEqual(self.standings(league), full_season)
+
+        rebuild_standings(league)
+        self.assertEqual(self.standings(league), full_season)
+
+    def test_games_played_one_at_a_time_match_a_recount(self):
+        self.create_league(9, 8)
+        self.run_jobs()
+        league = League.objects.get()
+        start_season(league, season=league.season)
+        teams = list(league.team_set.order_by('id'))
+
+        rng = np.random.default_rng(3)
+        for game in Game.objects.filter(played=False).order_by('date', 'id'):
+            with CaptureQueriesContext(connection) as queries:
+                game.points_scored(rng)
+            recount = standings_table(records_from_games(league, teams))
+            self.assertEqual(self.standings(league), [
+                (team.pk, *(row[field] for field in STANDING_FIELDS)) for team, row in zip(teams, recount)
+            ])
+
+            #only the rows of the two teams are rewritten, the others at most get a new place or games back
+            standing_writes = [query['sql'] for query in queries if '"project_standing"' in query['sql'] and not query['sql'].startswith('SELECT')]
+            self.assertFalse([sql for sql in standing_writes if sql.startswith(('DELETE', 'INSERT'))])
+            self.assertLessEqual(len(standing_writes), 2 + len(teams) + 1)
+
+        #playing a game again does not count it twice
+        played = self.standings(league)
+        game.points_scored(rng)
+        self.assertEqual(self.standings(league), played)
+        self.assertEqual(sum(row[2] for row in played), Game.objects.filter(played=True).count())
+
+    def test_admin_score_edits_move_the_winner(self):
+        self.create_league(4, 6)
+        self.run_jobs()
+        game = Game.objects.filter(played=True).first()
+        loser = game.team2 if game.winner_id == game.team1_id else game.team1
+
+        #the losing team is given more points by hand
+        User.objects.create_superuser('admin', password='password')
+        self.client.login(username='admin', password='password')
+        points = {'points_scored_team1': 90, 'points_scored_team2': 90}
+        points['points_scored_team1' if loser == game.team1 else 'points_scored_team2'] = 120
+        self.client.post(reverse('admin:project_game_change', args=[game.pk]), {
+            'league': game.league_id, 'team1': game.team1_id, 'team2': game.team2_id, 'date': game.date, **points,
+        })
+
+        game.refresh_from_db()
+        self.assertEqual(game.winner, loser)
+        self.assertTrue(game.played)
+        self.assertEqual(Team.objects.get(pk=loser.pk).standing.wins, Game.objects.filter(winner=loser).count())
+
+    def test_team_record_cannot_be_edited(self):
+        self.create_league(4, 6)
+        self.run_jobs()
+        team = Team.objects.first()
+        wins = team.wins
+
+        self.client.post(reverse('update_team', args=[team.league_id, team.pk]),
+                         {'name': team.name, 'city': team.city, 'wins': wins + 10})
+        team.refresh_from_db()
+        self.assertEqual(team.wins, wins)
+        self.assertEqual(team.standing.wins, wins)
+
+
+class StatsTests(LeagueTestMixin, TestCase):
+    '''the grouped stats agree with the games and are dropped when the league is simulated again'''
+
+    def test_team_stats_and_head_to_head(self):
+        self.create_league(6, 10)
+        self.run_jobs()
+        league = League.objects.get()
+        team = league.team_set.order_by('id').first()
+
+        stats = team_stats(league)[team.pk]
+        games = list(team.team_schedule())
+        scored = sum(game.points_scored_team1 if game.team1_id == team.pk else game.points_scored_team2 for game in games)
+        self.assertEqual((stats.games, stats.wins, stats.losses), (len(games), team.wins, team.losses))
+        self.assertEqual(stats.points_for, scored)
+        self.assertEqual(stats.home_wins + stats.away_wins, team.wins)
+
+        records = head_to_head(team)
+        self.assertEqual(len(records), 5)
+        self.assertEqual(sum(record.wins for record in records), team.wins)
+        self.assertEqual(sum(record.points_for for record in records), scored)
+
+    def test_resimulation_drops_cached_stats(self):
+        self.create_league(4, 6)
+        self.run_jobs()
+        league = League.objects.get()
+        before = team_stats(league)
+
+        simulate_league(league)
+        self.assertNotEqual(team_stats(league), before)
+        self.assertEqual(team_stats(league), compute_team_stats(league))
+
+
+class ExportTests(LeagueTestMixin, TestCase):
+    '''the exports stream every row of the league in both formats'''
+
+    def export(self, league, kind, export_format):
+        response = self.client.get(reverse('league_export', args=[league.pk, kind, export_format]))
+        self.assertEqual(response.status_code, 200)
+        #under wsgi the rows come from a plain iterator, an async one would be read whole first
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.is_async)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_and_ndjson_exports(self):
+        self.create_league(4, 6)
+        self.run_jobs()
+        league = League.objects.get()
+
+        lines = self.export(league, 'games', 'csv').splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['id', 'date'])
+        self.assertEqual(len(lines) - 1, league.games.count())
+
+        standings = [json.loads(line) for line in self.export(league, 'standings', 'ndjson').splitlines()]
+        self.assertEqual([row['place'] for row in standings], [1, 2, 3, 4])
+        self.assertEqual(sum(row['wins'] for row in standings), league.games.filter(played=True).count())
+
+        rosters = self.export(league, 'rosters', 'ndjson').splitlines()
+        self.assertEqual(len(rosters), Player.objects.filter(team__league=league).count())
+
+        response = self.client.get(reverse('league_export', args=[league.pk, 'coaches', 'csv']))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_asgi_export_reads_rows_asynchronously(self):
+        await sync_to_async(self.create_league)(4, 6)
+        await sync_to_async(self.run_jobs)()
+        league = await League.objects.aget()
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('league_export', args=[league.pk, 'games', 'csv']))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+
+        lines = b''.join([chunk async for chunk in response.streaming_content]).decode().splitlines()
+        self.assertEqual(len(lines) - 1, await league.games.acount())
+
+
+class ImportTests(LeagueTestMixin, TestCase):
+    '''a roster file is imported with a handful of queries, and a bad file is reported row by row'''
+
+    def import_league(self, content, filename):
+        return self.client.post(reverse('import_league'), {
+            'name': 'Imported', 'num_games': 30, 'seed': 1,
+            'logo': SimpleUploadedFile('logo.gif', LOGO, content_type='image/gif'),
+            'roster': SimpleUploadedFile(filename, content.encode()),
+        })
+
+    def test_rosters_export_imports_back(self):
+        self.create_league(30, 30)
+        league = League.objects.get()
+        roster = b''.join(self.client.get(reverse('league_export', args=[league.pk, 'rosters', 'csv'])).streaming_content)
+
+        #counted with an execute wrapper, the query log is reset when the request starts
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+            response = self.import_league(roster.decode(), 'rosters.csv')
+        imported = League.objects.get(name='Imported')
+        self.assertRedirects(response, reverse('league_detail', args=[imported.pk]))
+
+        #session, user, the league, the teams, the players, the standings and the queued job
+        self.assertLessEqual(len(queries), 12, queries)
+
+        fields = ['team__city', 'team__name', 'first_name', 'last_name', 'position', 'star', 'dob']
+        players = lambda league: list(Player.objects.filter(team__league=league).order_by('team_id', 'id').values_list(*fields))
+        self.assertEqual(players(imported), players(league))
+        self.assertEqual(imported.num_teams, 30)
+        self.assertEqual(imported.standings.count(), 30)
+        self.assertEqual(
+            list(imported.team_set.order_by('id').values_list('star_count', flat=True)),
+            list(league.team_set.order_by('id').values_list('star_count', flat=True)),
+        )
+
+    def test_errors_are_reported_per_row(self):
+        roster = '\n'.join([
+            json.dumps({'city': 'Tampa', 'team_name': 'Bulls', 'first_name': 'Ann', 'last_name': 'Lee', 'position': 'Guard', 'star': True, 'dob': '2000-01-02'}),
+            json.dumps({'city': 'Tampa', 'team_name': 'Bulls', 'first_name': 'Bo', 'last_name': 'Ray', 'position': 'Pitcher', 'star': False, 'dob': '2000-01-02'}),
+            '{not json',
+            json.dumps({'city': 'Miami', 'team_name': 'Heat', 'first_name': 'Cy', 'last_name': 'Fox', 'position': 'Center', 'star': 'maybe', 'dob': '2000-01-02'}),
+        ])
+        response = self.import_league(roster, 'rosters.ndjson')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(League.objects.exists())
+        errors = [str(message) for message in response.context['messages']]
+        self.assertTrue(any(error.startswith('Line 2: position') for error in errors))
+        self.assertTrue(any(error.startswith('Line 3: not valid json') for error in errors))
+        self.assertTrue(any(error.startswith('Line 4: star') for error in errors))
+
+
+    def test_command_reports_files_that_are_not_utf8(self):
+        with tempfile.NamedTemporaryFile(suffix='.csv') as roster:
+            roster.write('city,team_name,first_name,last_name,position,star,dob\nSão Paulo,Lions,,,,,\n'.encode('latin-1'))
+            roster.flush()
+            with self.assertRaisesMessage(CommandError, 'utf-8'):
+                call_command('import_league', roster.name, user=self.user.username, no_games=True)
+        self.assertFalse(League.objects.exists())
+
+        with self.assertRaisesMessage(CommandError, 'at least 2 teams'):
+            call_command('generate_league', user=self.user.username, teams=1, no_games=True)
+
+class ApiTests(LeagueTestMixin, TestCase):
+    '''the json api runs a fixed number of queries and answers polling clients with a 304'''
+
+    def setUp(self):
+        super().setUp()
+        self.create_league(6, 10)
+        self.run_jobs()
+        self.league = League.objects.get()
+        self.team = self.league.team_set.order_by('id').first()
+
+    def test_query_counts(self):
+        #session, user and league, then the data - one query, two for the team endpoints
+        urls = [
+            (4, reverse('api_league', args=[self.league.pk])),
+            (4, reverse('api_standings', args=[self.league.pk])),
+            (4, reverse('api_games', args=[self.league.pk]) + f'?team={self.team.pk}'),
+            (5, reverse('api_team_schedule', args=[self.league.pk, self.team.pk])),
+            (5, reverse('api_team_roster', args=[self.league.pk, self.team.pk])),
+        ]
+        for num_queries, url in urls:
+            with self.assertNumQueries(num_queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+
+        schedule = self.client.get(urls[3][1]).json()['games']
+        self.assertEqual(len(schedule), self.team.team_schedule().count())
+        standings = self.client.get(urls[1][1]).json()['standings']
+        self.assertEqual([row['place'] for row in standings], list(range(1, 7)))
+
+    def test_conditional_get(self):
+        url = reverse('api_standings', args=[self.league.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        simulate_league(self.league)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_errors(self):
+        self.assertEqual(self.client.get(reverse('api_games', args=[self.league.pk]) + '?after=bad').status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_team_roster', args=[self.league.pk, 0])).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_league', args=[self.league.pk])).status_code, 401)
+
+
+class AsyncViewTests(LeagueTestMixin, TestCase):
+    '''the read views run on the event loop under asgi and long poll the simulation jobs'''
+
+    def setUp(self):
+        super().setUp()
+        self.create_league(6, 10)
+        self.league = League.objects.get()
+        self.team = self.league.team_set.order_by('id').first()
+        self.urls = [
+            reverse('league_list'),
+            reverse('league_stats', args=[self.league.pk]),
+            reverse('league_teams', args=[self.league.pk]),
+            reverse('team_detail', args=[self.league.pk, self.team.pk]),
+            reverse('api_standings', args=[self.league.pk]),
+        ]
+
+    def test_read_views_are_async(self):
+        for url in self.urls:
+            self.assertTrue(iscoroutinefunction(resolve(url).func), url)
+
+    async def test_asgi_requests(self):
+        await self.async_client.aforce_login(self.user)
+        for url in self.urls:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+        self.assertContains(await self.async_client.get(self.urls[3]), str(self.team))
+
+        response = await self.async_client.get(self.urls[4], headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        await self.async_client.alogout()
+        response = await self.async_client.get(self.urls[1])
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(JOB_STATUS_POLL_INTERVAL=0.01)
+    def test_job_status_long_poll(self):
+        job = self.league.simulationjob_set.get()
+        url = reverse('simulation_job_status', args=[self.league.pk, job.pk])
+
+        #nothing moved, so the answer comes when the wait is over
+        started = time.perf_counter()
+        response = self.client.get(url, {'wait': 0.2, 'status': job.status, 'progress': job.progress})
+        self.assertGreaterEqual(time.perf_counter() - started, 0.2)
+        self.assertEqual(response.json()['status'], job.status)
+
+        #the page shows an older state, so the answer comes right away
+        self.run_jobs()
+        response = self.client.get(url, {'wait': 10, 'status': job.status, 'progress': job.progress})
+        self.assertTrue(response.json()['finished'])
+
+
+@override_settings(REQUEST_TIMING=True, REQUEST_TIMING_SLOW_MS=0)
+class RequestTimingTests(LeagueTestMixin, TestCase):
+    '''the opt-in instrumentation middleware reports every request and keeps the slow ones for staff'''
+
+    def test_server_timing_and_slow_requests(self):
+        client = Client()  #a new client loads the middleware with the overridden settings
+        client.force_login(self.user)
+
+        with self.assertLogs('hw.requests', 'INFO') as logs:
+            response = client.get(reverse('league_list'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+        entry = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(entry['path'], reverse('league_list'))
+        self.assertGreater(entry['queries'], 0)
+
+        #only staff can see the slow requests - these requests are logged as well
+        with self.assertLogs('hw.requests', 'INFO'):
+            self.assertEqual(client.get(reverse('slow_requests')).status_code, 302)
+            self.user.is_staff = True
+            self.user.save()
+            paths = [request['path'] for request in client.get(reverse('slow_requests')).json()['requests']]
+        self.assertIn(reverse('league_list'), paths)
+
+    async def test_asgi_requests_are_timed(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+
+        with self.assertLogs('hw.requests', 'INFO') as logs:
+            response = await client.get(reverse('league_list'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        #the queries of the async orm run in another thread, they are counted all the same
+        self.assertGreater(json.loads(logs.records[-1].getMessage())['queries'], 0)
+
+
+class SimulationLockTests(LeagueTestMixin, TestCase):
+    '''a league is simulated by one run at a time, repeated simulate posts attach to the queued job'''
+
+    def setUp(self):
+        super().setUp()
+        self.create_league(4, 6)
+        self.run_jobs()
+        self.league = League.objects.latest('id')
+
+    def post(self, action='season', key='page-token', follow=False):
+        return self.client.post(reverse('simulate_league', args=[self.league.pk]),
+                                {'action': action, 'idempotency_key': key}, follow=follow)
+
+    def test_repeated_posts_attach_to_one_job(self):
+        jobs = SimulationJob.objects.filter(league=self.league)
+        before = jobs.count()
+
+        self.post()
+        response = self.post(follow=True)
+        self.assertEqual(jobs.count(), before + 1)
+        self.assertContains(response, 'following that run')
+
+        #another tab has another token, it still follows the queued job
+        self.post(key='other-tab')
+        self.assertEqual(jobs.count(), before + 1)
+
+        #other buttons of the page queue their own job
+        self.post(action='new_season')
+        self.assertEqual(jobs.count(), before + 2)
+
+        #the same form posted again after its job is done does not run it a second time
+        self.run_jobs()
+        season = League.objects.get(pk=self.league.pk).season
+        self.post()
+        self.run_jobs()
+        self.assertEqual(jobs.count(), before + 2)
+        self.assertEqual(League.objects.get(pk=self.league.pk).season, season)
+
+    def test_only_the_owner_manages_the_league(self):
+        jobs = SimulationJob.objects.filter(league=self.league)
+        before = jobs.count()
+
+        User.objects.create_user('rival', password='password')
+        self.client.login(username='rival', password='password')
+        url = reverse('league_management', args=[self.league.pk])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.post(url).status_code, 404)
+        self.assertEqual(self.post().status_code, 404)
+        self.assertEqual(jobs.count(), before)
+
+    def test_locked_league_is_not_simulated(self):
+        with league_lock(self.league, owner='another run'):
+            with self.assertRaises(LeagueBusy):
+                run_action(self.league)
+
+            #the worker leaves the job in the queue until the lock is given back
+            self.post()
+            self.assertIsNone(claim_next_job())
+
+        job = claim_next_job()
+        self.assertEqual(run_job(job).status, SimulationJob.DONE)
+        self.assertFalse(LeagueLock.objects.exists())
+
+    def test_jobs_of_a_dead_worker_do_not_block_the_league(self):
+        #a worker claims a job and dies without finishing it, its lock is left behind
+        self.post()
+        dead = claim_next_job()
+        self.post(action='next_day', key='later')
+        self.assertIsNone(claim_next_job())
+
+        #once the lock runs out the dead job is failed and new posts queue their own runs
+        past = timezone.now() - datetime.timedelta(seconds=settings.SIMULATION_LOCK_TIMEOUT + 1)
+        LeagueLock.objects.update(expires_at=past)
+        SimulationJob.objects.filter(pk=dead.pk).update(started_at=past)
+        job, created = enqueue_simulation(self.league)
+        self.assertTrue(created)
+
+        self.run_jobs()
+        self.assertEqual(SimulationJob.objects.get(pk=dead.pk).status, SimulationJob.FAILED)
+        self.assertEqual(SimulationJob.objects.get(pk=job.pk).status, SimulationJob.DONE)
+        self.assertFalse(SimulationJob.objects.filter(status__in=[SimulationJob.QUEUED, SimulationJob.RUNNING]).exists())
+        self.assertFalse(LeagueLock.objects.exists())
+
+    def test_long_runs_keep_their_lock(self):
+        #the run started long ago and its lock is about to run out
+        self.post()
+        job = claim_next_job()
+        past = timezone.now() - datetime.timedelta(seconds=settings.SIMULATION_LOCK_TIMEOUT + 1)
+        SimulationJob.objects.filter(pk=job.pk).update(started_at=past)
+        LeagueLock.objects.update(expires_at=timezone.now() + datetime.timedelta(seconds=1))
+
+        def apply_action(league, action, through_date, progress):
+            progress(50, "Halfway")
+            #another worker looking for dead jobs leaves the run alone, its progress renewed the lock
+            self.assertEqual(fail_stale_jobs(), 0)
+            self.assertGreater(LeagueLock.objects.get().expires_at, timezone.now() + datetime.timedelta(seconds=60))
+            return []
+
+        with mock.patch('project.jobs.apply_action', apply_action):
+            self.assertEqual(run_job(job).status, SimulationJob.DONE)
+
+    def test_run_that_lost_its_lock_stays_failed(self):
+        self.post()
+        job = claim_next_job()
+        season = League.objects.get(pk=self.league.pk).season
+
+        #another worker takes the run for dead, the run stops at its next step without writing
+        LeagueLock.objects.update(expires_at=timezone.now())
+        self.assertEqual(fail_stale_jobs(), 1)
+        self.assertEqual(run_job(job).status, SimulationJob.FAILED)
+        self.assertEqual(SimulationJob.objects.get(pk=job.pk).message, "The worker running this job stopped.")
+        self.assertEqual(League.objects.get(pk=self.league.pk).season, season)
+
+    def test_league_deleted_during_a_run(self):
+        self.post()
+        job = claim_next_job()
+        League.objects.filter(pk=self.league.pk).delete()
+
+        #the job goes with its league, the worker carries on with the rest of the queue
+        self.assertEqual(run_job(job).status, SimulationJob.FAILED)
+        self.assertFalse(SimulationJob.objects.filter(pk=job.pk).exists())
+
+    def test_running_league_is_not_deleted_or_cleared(self):
+        self.post()
+        job = claim_next_job()
+
+        response = self.client.post(reverse('league_delete', args=[self.league.pk]), follow=True)
+        self.assertContains(response, 'being simulated')
+        response = self.client.post(reverse('league_update', args=[self.league.pk]), {
+            'name': self.league.name, 'num_teams': self.league.num_teams, 'num_games': self.league.num_games + 2,
+        })
+        self.assertContains(response, 'being simulated')
+        self.assertEqual(League.objects.get(pk=self.league.pk).num_games, self.league.num_games)
+
+        self.assertEqual(run_job(job).status, SimulationJob.DONE)
+        self.client.post(reverse('league_delete', args=[self.league.pk]))
+        self.assertFalse(League.objects.filter(pk=self.league.pk).exists())
+
+    def test_running_job_without_its_lock_is_failed(self):
+        self.post()
+        dead = claim_next_job()
+        LeagueLock.objects.all().delete()
+
+        self.post(action='next_day', key='later')
+        job = claim_next_job()
+        self.assertEqual(job.action, SimulationJob.NEXT_DAY)
+        self.assertEqual(SimulationJob.objects.get(pk=dead.pk).status, SimulationJob.FAILED)
+
+
+class ConcurrencyTests(SimpleTestCase):
+    '''simulations and reads running side by side in separate processes on a sqlite file, the way the web
+    and simulation workers share it - none of them may fail on the write lock'''
+
+    WRITERS = 4
+    READERS = 2
+
+    #reads the games, standings and stats of both leagues over and over while the writers run
+    READ_LOOP = (
+        "from project.exports import stream_export\n"
+        "from project.models import League\n"
+        "from project.stats import compute_team_stats\n"
+        "for _ in range(30):\n"
+        "    for league in League.objects.all():\n"
+        "        for kind in ('games', 'standings'):\n"
+        "            for line in stream_export(league, kind, 'csv'):\n"
+        "                pass\n"
+        "        compute_team_stats(league)\n"
+    )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.database = os.path.join(self.directory, 'db.sqlite3')
+        self.env = {**os.environ, 'SQLITE_PATH': self.database, 'DJANGO_SUPERUSER_PASSWORD': 'password'}
+
+    def manage(self, *args):
+        '''starts a manage.py command on the temporary database'''
+
+        return subprocess.Popen(
+            [sys.executable, 'manage.py', *args], cwd=settings.BASE_DIR, env=self.env,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+
+    def finish(self, process):
+        '''waits for a command, it has to succeed without a lock error'''
+
+        out, err = process.communicate(timeout=300)
+        self.assertEqual(process.returncode, 0, err)
+        self.assertNotIn('locked', out + err)
+
+    def test_parallel_simulations_and_reads(self):
+        for args in [
+            ('migrate', '-v0'),
+            ('createsuperuser', '--noinput', '--username', 'coach', '--email', 'coach@example.com'),
+            ('generate_league', '--user', 'coach', '--teams', '20', '--games', '40', '--leagues', '2', '--seed', '1'),
+        ]:
+            self.finish(self.manage(*args))
+
+        processes = [self.manage('simulate_league', '1', '2') for _ in range(self.WRITERS)]
+        processes += [self.manage('shell', '-c', self.READ_LOOP) for _ in range(self.READERS)]
+        for process in processes:
+            self.finish(process)
+
+        with closing(sqlite3.connect(self.database)) as db:
+            self.assertEqual(db.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+            #every league holds exactly one full season and standings that add up to it
+            games = dict(db.execute('SELECT league_id, COUNT(*) FROM project_game WHERE played GROUP BY league_id'))
+            wins = dict(db.execute('SELECT league_id, SUM(wins) FROM project_standing GROUP BY league_id'))
+            seasons = dict(db.execute('SELECT id, season FROM project_league'))
+        self.assertEqual(games, {1: 400, 2: 400})
+        self.assertEqual(wins, games)
+        #the league lock runs the writers one after the other, none of their seasons is lost
+        self.assertEqual(seasons, {1: 1 + self.WRITERS, 2: 1 + self.WRITERS})
+
+    @override_settings(DB_LOCK_RETRIES=3, DB_LOCK_RETRY_WAIT=0)
+    def test_lock_errors_are_retried(self):
+        calls = []
+
+        @retry_on_lock
+        def write():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return 'written'
+
+        self.assertEqual(write(), 'written')
+        self.assertEqual(len(calls), 3)
+
+        #out of attempts, the error gets through
+        @retry_on_lock
+        def always_locked():
+            calls.append(1)
+            raise OperationalError('database is locked')
+
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            always_locked()
+        self.assertEqual(len(calls), 3)
+
+
+@unittest.skipUnless(os.environ.get('BENCHMARK'), 'set BENCHMARK=1 to run the performance benchmark')
+class BenchmarkTests(LeagueTestMixin, TestCase):
+    '''times the league pages for a range of league sizes and writes a json report that can be diffed
+    between commits - BENCHMARK_REPORT sets the path of the report'''
+
+    def measure(self, step):
+        '''runs step and returns its seconds, query count and peak python memory in kb'''
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            step()
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {'seconds': round(seconds, 4), 'queries': len(queries), 'peak_kb': peak // 1024}
+
+    def test_benchmark(self):
+        report = []
+
+        for num_teams, num_games in benchmark_sizes():
+            results = {}
+            results['create'] = self.measure(lambda: self.create_league(num_teams, num_games))
+            league = League.objects.latest('id')
+            self.run_jobs()
+
+            #the page only queues the season, so the worker run is timed as its own step
+            results['simulate'] = self.measure(lambda: self.simulate_league(league))
+            results['simulate_worker'] = self.measure(self.run_jobs)
+
+            for name, method, url in self.pages(league):
+                results[name] = self.measure(lambda: getattr(self.client, method)(url))
+            results['delete'] = self.measure(lambda: self.client.post(reverse('league_delete', args=[league.pk])))
+
+            report.append({'teams': num_teams, 'games': num_games, 'results': results})
+            print(f"\n{num_teams} teams, {num_games} games: " + ", ".join(
+                f"{name} {result['seconds']:.3f}s/{result['queries']}q/{result['peak_kb']}kb"
+                for name, result in results.items()
+            ))
+
+        path = os.environ.get('BENCHMARK_REPORT', 'benchmark_report.json')
+        with open(path, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
@@ -4,6 +4,7 @@
 from django.urls import path
 from . import views
 from .views import *
+from . import api
 from django.contrib.auth import views as auth_views
 from django.conf import settings
 from django.conf.urls.static import static
@@ -14,12 +15,17 @@ urlpatterns = [
 
     ##league tabs
     path(r'create_league', CreateLeagueView.as_view(), name='create_league'), 
+    path(r'import_league', ImportLeagueView.as_view(), name='import_league'),
     path(r'leagues/', LeagueListView.as_view(), name='league_list'),
     path(r'league/<int:pk>/', LeagueDetailView.as_view(), name='league_detail'),
     path(r'league/<int:pk>/management/', LeagueManagementView.as_view(), name='league_management'),
     path(r'league/<int:pk>/management/stats/', LeagueStatsView.as_view(), name='league_stats'),
+    path(r'league/<int:pk>/management/stats/games/', LeagueGamesView.as_view(), name='league_games'),
+    path(r'league/<int:pk>/export/<str:kind>.<str:export_format>', LeagueExportView.as_view(), name='league_export'),
     path(r'league/<int:pk>/management/teams/', LeagueTeamsView.as_view(), name='league_teams'),
+    path(r'league/<int:pk>/management/projection/', LeagueProjectionView.as_view(), name='league_projection'),
     path(r'league/<int:pk>/simulate/', SimulateLeagueView.as_view(), name='simulate_league'),
+    path(r'league/<int:pk>/jobs/<int:job_pk>/', SimulationJobStatusView.as_view(), name='simulation_job_status'),
     path(r'league/<int:pk>/update/', LeagueUpdateView.as_view(), name='league_update'),
     path(r'league/<int:pk>/delete/', LeagueDeleteView.as_view(), name='league_delete'),
 
@@ -32,6 +38,13 @@ urlpatterns = [
     path(r'league/<int:league_pk>/team/<int:team_pk>/player/<int:pk>/', PlayerDetailView.as_view(), name='player_detail'),
     path(r'league/<int:league_pk>/team/<int:team_pk>/player/<int:pk>/update/', UpdatePlayerView.as_view(), name='update_player'),
 
+    #read only json api, the version is part of the path
+    path(r'api/v1/leagues/<int:pk>/', api.league_summary, name='api_league'),
+    path(r'api/v1/leagues/<int:pk>/standings/', api.league_standings, name='api_standings'),
+    path(r'api/v1/leagues/<int:pk>/games/', api.league_games, name='api_games'),
+    path(r'api/v1/leagues/<int:pk>/teams/<int:team_pk>/schedule/', api.team_schedule, name='api_team_schedule'),
+    path(r'api/v1/leagues/<int:pk>/teams/<int:team_pk>/roster/', api.team_roster, name='api_team_roster'),
+
     #authentication tabs
     path('login/', auth_views.LoginView.as_view(template_name='project/login.html'), name="login"),
     path('logout/', auth_views.LogoutView.as_view(next_page='logged_out'), name="logout"),
@@ -1,11 +1,11 @@
 #Hinsley Casenet - U59220930
 #project/views.py - core functionality of the page, return to user requests
 
-from django.http import HttpResponseRedirect
-from django.shortcuts import render, get_object_or_404, redirect
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render, get_object_or_404, redirect, aget_object_or_404
 from django.views import View
 from django.views.generic import ListView, DetailView, TemplateView, DeleteView, FormView
-import random
 from .models import *
 from .forms import *
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
@@ -14,11 +14,37 @@ from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.forms import UserCreationForm 
 from django.urls import reverse_lazy
-from django.utils import timezone
+import asyncio
 import datetime
+import io
+import time
+import uuid
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from .concurrency import LeagueBusy, league_lock
+from .jobs import enqueue_simulation
+from .projections import project_season
+from .generation import generate_league
+from .imports import RosterImportError, format_of, import_league
+from .simulation import SimulationError, clear_schedule
+from .pagination import agames_page, games_page
+from .stats import ahead_to_head, ateam_stats
+from .caching import LeagueFragmentMixin
+from .asyncviews import AsyncLeagueFragmentView, AsyncLoginRequiredMixin, AsyncTemplateView
+from .exports import EXPORT_FORMATS, EXPORT_KINDS, astream_export, stream_export
+from django.template.loader import render_to_string
 
 # Create your views here.
 
+def simulation_key(request, action, through_date=None):
+    '''idempotency key of a simulate post - the token of the page plus what was asked for, so every form of
+    one page render gets its own key. empty when the post has no token'''
+
+    token = request.POST.get('idempotency_key', '')[:32]
+    return f'{token}-{action}-{through_date or ""}' if token else ''
+
+
 def index(request):
     """displays the home page for the application"""
     
@@ -28,6 +54,15 @@ def index(request):
     return render(request, 'project/index.html')
 
 
+def save_changed_fields(form):
+    '''saves only the fields changed on the form - the simulation writes other fields of the same rows
+    (records, data version) and a stale copy must never overwrite them'''
+
+    instance = form.save(commit=False)
+    instance.save(update_fields=form.changed_data)
+    return instance
+
+
 class LeagueUpdateView(LoginRequiredMixin, UpdateView):
     '''manages updating the league, makes usage of a form'''
 
@@ -42,6 +77,29 @@ class LeagueUpdateView(LoginRequiredMixin, UpdateView):
         queryset = super().get_queryset()
         return queryset.filter(user_league=self.request.user)
 
+    def form_valid(self, form):
+        #the stored schedule no longer fits once the season length changes, it is rebuilt on the next simulation -
+        #it is only cleared under the league lock, a running simulation would go on writing its games
+
+        if 'num_games' not in form.changed_data:
+            return self.save_league(form)
+        try:
+            with league_lock(form.instance, owner=f'update by {self.request.user}'):
+                return self.save_league(form)
+        except LeagueBusy:
+            form.add_error('num_games', "The league is being simulated, the season length can be changed once that run is over.")
+            return self.form_invalid(form)
+
+    def save_league(self, form):
+        '''saves the changed fields and clears the schedule when the season length changed'''
+
+        with transaction.atomic():
+            self.object = save_changed_fields(form)
+            if 'num_games' in form.changed_data:
+                clear_schedule(self.object)
+            self.object.bump_data_version()
+        return HttpResponseRedirect(self.get_success_url())
+
 
 class LeagueDeleteView(LoginRequiredMixin, DeleteView):
     '''manages deleting a league - redirects to a confirmation page'''
@@ -55,6 +113,16 @@ class LeagueDeleteView(LoginRequiredMixin, DeleteView):
         queryset = super().get_queryset()
         return queryset.filter(user_league=self.request.user)
 
+    def form_valid(self, form):
+        #the league is deleted under its lock, a running simulation would go on writing to a league that is gone
+
+        try:
+            with league_lock(self.object, owner=f'delete by {self.request.user}'):
+                return super().form_valid(form)
+        except LeagueBusy:
+            messages.error(self.request, "The league is being simulated, it can be deleted once that run is over.")
+            return HttpResponseRedirect(reverse('league_management', args=[self.object.pk]))
+
 from django.contrib import messages
 from django.urls import reverse
 from django.shortcuts import render
@@ -71,13 +139,16 @@ class CreateLeagueView(LoginRequiredMixin, CreateView):
         """handles the form submission to create a new League object tied to the current user"""
 
         form.instance.user_league = self.request.user  #association with logged-in user
-        response = super().form_valid(form)
 
-        #random generation method
-        self.generate_teams_and_players(self.object)
-        
-        #simulation method
-        self.simulate_games(self.object)
+        #the league, its rosters and the queued simulation are written together or not at all
+        with transaction.atomic():
+            response = super().form_valid(form)
+
+            #random generation method
+            self.generate_teams_and_players(self.object)
+
+            #simulation method
+            self.simulate_games(self.object)
 
         #flash message on successful league creation
         messages.success(self.request, 'League successfully created!')
@@ -102,109 +173,14 @@ class CreateLeagueView(LoginRequiredMixin, CreateView):
         return self.render_to_response({'form': form})
 
     def simulate_games(self, league):
-        """simulates games for the league after it is created - simulateview is the subroutine"""
-        SimulateLeagueView().post(self.request, pk=league.pk)
+        """queues the first simulation of the league after it is created - a background worker runs it"""
+        enqueue_simulation(league)
 
     def generate_teams_and_players(self, league):
-        """randomly generates teams and players for a league upon creation"""
-
-        team_names = [
-            "Hawks", "Fighters", "Giants", "Foxes", "Spinners", 
-            "Lions", "Panthers", "Wolves", "Dragons", "Tide",
-            "Dinos", "Eagles", "65ers", "Barons", "Newmans",
-            "Wileys", "Blaze", "Tigers", "Kings", "Chuckers",
-            "Ardrats", "Gladiators", "Rexes", "Brewers",
-            "Brave", "Stars", "Racers", "Menaces", "Thieves",
-            "Maimers", "Flight", "Muse", "Legends", "Glory"
-        ]
-        american_cities = [
-            "New York", "Los Angeles", "Chicago", "Houston", "Phoenix",
-            "Philadelphia", "San Antonio", "San Diego", "Dallas", "San Jose",
-            "Newark", "Boston", "New Orleans", "Las Vegas", "Honolulu", 
-            "Detroit", "Anaheim", "Milwaukee", "Philadelphia", "Seattle",
-            "Indianapolis", "San Francisco", "Austin", "Portland", 
-            "Nashville", "El Paso", "Denver", "Fort Worth", "Jacksonville",
-            "Charlotte", "Oklahoma City", "Washington", "D.C.",
-            "Sacramento", "Baltimore", "Atlanta", "Memphis", "Orlando", "Miami"
-        ]
-        player_first_names = [
-            "John", "Mikey", "Chris", "Jared", "Alex", "Arnold", "Robert", "Anthony", "Marko", "David",
-            "Michael", "James", "Daniel", "Matthew", "Joseph", "Joshua", "Andrew", "Justin", "Kevin", "Ryan",
-            "Jacob", "Ethan", "Tyler", "Brandon", "Nicholas", "Zachary", "Adam", "Nathan", "Eric", "Sean",
-            "Cameron", "Aaron", "Kyle", "Jason", "Brian", "Logan", "Jeffrey", "Samuel", "Austin", "Jonathan",
-            "Christian", "Gregory", "Patrick", "Peter", "Scott", "Lucas", "Dylan", "Paul", "Evan", "Trevor",
-            "Steven", "Blake", "Shane", "Colin", "Bradley", "Mitchell", "Cody", "Hunter", "Jordan", "Spencer",
-            "Luke", "Gavin", "Tyson", "Elijah", "Isaac", "Chase", "Vincent", "Marcus", "Tristan", "Grant",
-            "Cole", "Dominic", "Brent", "Wesley", "Maxwell", "Jack", "Phillip", "Owen", "Damian", "Tanner"
-        ]
-        player_last_names = [
-            "White", "Johnson", "Brown", "Taylor", "Anderson", "Lee", "Clark", "Walker", "Robinson", "Lewis",
-            "Harris", "Young", "Allen", "King", "Wright", "Scott", "Green", "Baker", "Adams", "Nelson",
-            "Carter", "Mitchell", "Perez", "Roberts", "Turner", "Phillips", "Campbell", "Parker", "Evans", "Edwards",
-            "Collins", "Stewart", "Morris", "Rodriguez", "Reed", "Cook", "Morgan", "Bell", "Murphy", "Bailey",
-            "Rivera", "Cooper", "Richardson", "Cox", "Howard", "Ward", "Torres", "Peterson", "Gray", "Ramirez",
-            "James", "Watson", "Brooks", "Kelly", "Sanders", "Price", "Bennett", "Wood", "Barnes", "Ross",
-            "Henderson", "Coleman", "Jenkins", "Perry", "Powell", "Long", "Patterson", "Hughes", "Flores", "Washington",
-            "Butler", "Simmons", "Foster", "Gonzalez", "Bryant", "Alexander", "Russell", "Griffin", "Diaz", "Hayes"
-        ]
-
-        positions = ["Forward", "Guard", "Center"]
-
-        random.shuffle(team_names)
-        random.shuffle(american_cities)
-        used_team_names = set()
-        used_player_names = set()
-
-        for i in range(min(league.num_teams, len(team_names))):
-            #ensures no duplicate team names - teams can share location but not a name
-
-            team_name = team_names[i]
-            if team_name in used_team_names:
-                continue
-            used_team_names.add(team_name)
-
-            #team creation logic
-            team = Team.objects.create(
-                league=league,
-                name=team_name,
-                city=american_cities[i % len(american_cities)], 
-                #default values for teams
-                place_in_standings=0,
-                wins=0,
-                losses=0,
-                star_mult=0
-            )
-
-            #default value for number of star players
-            star_player_count = 0
-
-            #player generation for the team
-            for _ in range(5):  #each team has a roster of 5 players
-                is_star = random.random() < 0.2  # 20% chance for a player to be a star
-                if is_star:
-                    star_player_count += 1
-
-                #no duplicate FULL player name combinations
-                first_name, last_name = None, None
-                while True:
-                    first_name = random.choice(player_first_names)
-                    last_name = random.choice(player_last_names)
-                    if (first_name, last_name) not in used_player_names:
-                        used_player_names.add((first_name, last_name))
-                        break
-
-                Player.objects.create(
-                    team=team,
-                    first_name=first_name,
-                    last_name=last_name,
-                    position=random.choice(positions),
-                    star=is_star,
-                    dob=f"{random.randint(1985, 2005)}-{random.randint(1, 12):02}-{random.randint(1, 28):02}",
-                )
-
-            #update the star multiplier based on the number of star players
-            team.star_mult = int(star_player_count * 1.02 * 100)
-            team.save()
+        """randomly generates teams and players for a league upon creation - everything is built in
+        memory and bulk inserted, see generation.generate_league"""
+
+        generate_league(league)
 
     def get_success_url(self):
         '''returns a url to redirect to upon successful creation'''
@@ -212,13 +188,44 @@ class CreateLeagueView(LoginRequiredMixin, CreateView):
         return reverse('league_detail', kwargs={'pk': self.object.pk})
 
 
+class ImportLeagueView(CreateLeagueView):
+    '''creates a league with the teams and players of an uploaded roster file - the file is read line by
+    line and written with one bulk insert per model, see imports.import_league'''
+
+    form_class = ImportLeagueForm
+    template_name = "project/import_league_form.html"
+
+    def form_valid(self, form):
+        '''imports the roster and queues the first season, or shows the errors of every bad row'''
+
+        league = form.instance
+        league.user_league = self.request.user
+        roster = form.cleaned_data['roster']
+
+        try:
+            with transaction.atomic():
+                #the upload is decoded as it is read, it is never loaded whole
+                import_league(league, io.TextIOWrapper(roster.file, encoding='utf-8-sig', newline=''), format_of(roster.name))
+                enqueue_simulation(league)
+        except (RosterImportError, UnicodeDecodeError) as error:
+            messages.error(self.request, "The roster could not be imported.")
+            for message in (error.messages() if isinstance(error, RosterImportError) else ["The roster must be utf-8 text."]):
+                messages.error(self.request, message)
+            return self.render_to_response({'form': form})
+
+        self.object = league
+        messages.success(self.request, f'League imported with {league.num_teams} teams!')
+        return HttpResponseRedirect(self.get_success_url())
+
+
  
     
-class LeagueDetailView(LoginRequiredMixin, DetailView):
+class LeagueDetailView(LoginRequiredMixin, LeagueFragmentMixin, DetailView):
     '''detail view about a specific league in the db'''
 
     model = League
     template_name = 'project/league.html'
+    fragment_template = 'project/fragments/league_detail.html'
     context_object_name = 'league'
 
     def get_context_data(self, **kwargs):
@@ -237,17 +244,17 @@ class LeagueDetailView(LoginRequiredMixin, DetailView):
 
         return context
     
-class LeagueListView(LoginRequiredMixin, ListView):
+class LeagueListView(AsyncTemplateView):
     '''list of leagues that the user can view'''
 
-    model = League
-    template_name = 'league_list.html'
-    context_object_name = 'leagues'
+    template_name = 'project/league_list.html'
 
-    def get_queryset(self):
-        #only return leagues created by the logged-in user
+    async def aget_context_data(self, **kwargs):
+        context = await super().aget_context_data(**kwargs)
 
-        return League.objects.filter(user_league=self.request.user)
+        #only return leagues created by the logged-in user
+        context['leagues'] = [league async for league in League.objects.filter(user_league=self.request.user)]
+        return context
     
 
 class LeagueManagementView(LoginRequiredMixin, TemplateView):
@@ -255,33 +262,50 @@ class LeagueManagementView(LoginRequiredMixin, TemplateView):
 
     template_name = "project/league_management.html"
 
+    def get_league(self):
+        '''the league being managed - like SimulateLeagueView, only its owner may manage it'''
+
+        return get_object_or_404(League, pk=self.kwargs['pk'], user_league=self.request.user)
+
     def get_context_data(self, **kwargs):
         #returns necessary context regarding the league
 
         context = super().get_context_data(**kwargs)
-        league = get_object_or_404(League, pk=self.kwargs['pk'])
+        league = self.get_league()
         context['league'] = league
 
-        #counts the number of games simulated
-        num_games_simulated = Game.objects.filter(team1__league=league).count()
-        context['num_games_simulated'] = num_games_simulated
+        #counts the number of games simulated and still to play in the current season
+        season = Game.objects.filter(league=league).aggregate(
+            games_played=Count('id', filter=Q(played=True)),
+            games_pending=Count('id', filter=Q(played=False)),
+            next_date=Min('date', filter=Q(played=False)),
+        )
+        context['num_games_simulated'] = season['games_played']
+        context['num_games_pending'] = season['games_pending']
+        context['next_game_date'] = season['next_date']
+
+        #most recent background simulation, the template polls it while it is running
+        context['job'] = SimulationJob.objects.filter(league=league).order_by('-created_at', '-id').first()
+
+        #sent back with every simulate form, posting the same form again does not queue a second run
+        context['idempotency_key'] = uuid.uuid4().hex
 
         return context
 
     def post(self, request, *args, **kwargs):
         '''method to update the league specifically after simulating games OR resimulating games'''
 
-        league = get_object_or_404(League, pk=self.kwargs['pk'])
+        league = self.get_league()
         #teams = Team.objects.filter(league=league)
 
-        #clear existing games for re-simulation
-        deleted_games, _ = Game.objects.filter(team1__league=league).delete()
-        print(f"Deleted games count in post: {deleted_games}")
-
-        #simulate games using SimulateLeagueView logic
-        SimulateLeagueView().post(request, pk=league.pk)
+        #queue the simulation - existing games are replaced by the worker inside its transaction, a repeated
+        #post follows the simulation that is already queued
+        job, created = enqueue_simulation(league, idempotency_key=simulation_key(request, SimulationJob.SEASON))
 
-        messages.success(request, f"Games simulated successfully!")
+        if created:
+            messages.success(request, "Games queued for simulation!")
+        else:
+            messages.info(request, f"{job.get_action_display()} is already {job.get_status_display().lower()} - following that run.")
         return redirect('league_management', pk=league.pk)
 
 
@@ -316,105 +340,100 @@ class TeamPlayersView(ListView):
     
 
 
-class SimulateLeagueView(View):
+class SimulateLeagueView(LoginRequiredMixin, View):
+    '''queues a simulation of the league - a full season, a new unplayed season, the next day or every
+    game up to a date, the work is done by a background worker'''
+
     def post(self, request, pk, *args, **kwargs):
-        '''method to update the league and resimulate games'''
+        '''method to queue the league simulation and return right away'''
 
-        league = get_object_or_404(League, pk=pk)
+        league = get_object_or_404(League, pk=pk, user_league=request.user)
 
-        #delete existing games before resimulation
-        deleted_games, _ = Game.objects.filter(team1__league=league).delete()
-        print(f"Deleted games count: {deleted_games}")
+        action = request.POST.get('action', SimulationJob.SEASON)
+        if action not in dict(SimulationJob.ACTION_CHOICES):
+            messages.error(request, "Unknown simulation option.")
+            return HttpResponseRedirect(reverse('league_management', args=[pk]))
 
-        #restores original number of games from the league - did this step explicitly bc i was having
-        #issues with the simulation logic
-        original_num_games = league.num_games
+        #simulating through a date needs a valid date from the form
+        through_date = None
+        if action == SimulationJob.THROUGH_DATE:
+            try:
+                through_date = datetime.date.fromisoformat(request.POST.get('through_date', ''))
+            except ValueError:
+                messages.error(request, "Please pick a date to simulate through.")
+                return HttpResponseRedirect(reverse('league_management', args=[pk]))
+
+        #a double click or a second tab attaches to the job that is already queued or running
+        job, created = enqueue_simulation(
+            league, action=action, through_date=through_date, idempotency_key=simulation_key(request, action, through_date)
+        )
 
-        teams = list(league.team_set.all())
-        num_teams = len(teams)
-        max_games = original_num_games
-        games_played = {team.id: 0 for team in teams}
+        if created:
+            messages.success(request, f"{job.get_action_display()} has been queued!")
+        else:
+            messages.info(request, f"{job.get_action_display()} is already {job.get_status_display().lower()} - following that run.")
+        return HttpResponseRedirect(reverse('league_management', args=[pk]))
 
-        #date assignment logic
-        next_available_date = {team.id: timezone.now().date() for team in teams}
 
-        #this should not be a problem because the league form error checks for this
-        if num_teams < 2:
-            messages.error(request, "Not enough teams to simulate games.")
-            return HttpResponseRedirect(reverse('league_management', args=[pk]))
+class SimulationJobStatusView(AsyncLoginRequiredMixin, View):
+    '''returns the status of a simulation job as json so the management page can poll it - with ?wait=<seconds>
+    the answer is held until the job moves on from the ?status= and ?progress= the page already shows (a long
+    poll), an async view so a waiting page does not hold a thread'''
 
-        #same as above
-        if max_games < num_teams - 1:
-            messages.error(request, f"Number of games per team must be at least {num_teams - 1} to ensure each team plays every other team at least once.")
-            return HttpResponseRedirect(reverse('league_management', args=[pk]))
+    async def get(self, request, pk, job_pk, *args, **kwargs):
+        jobs = SimulationJob.objects.filter(pk=job_pk, league_id=pk, league__user_league=request.user)
+        job = await aget_object_or_404(jobs)
 
-        #default information for each team
-        for team in teams:
-            team.wins = 0
-            team.losses = 0
-            team.place_in_standings = 0
-            team.save()
-
-        def schedule_game(team1, team2):
-            #method which takes care of scheduling a game - makes sure that the gap is between 2 or 3 days for each team
-
-            game_date = max(next_available_date[team1.id], next_available_date[team2.id]) #assigns a next date from the 
-            #highest avaiable date between the two teams
-            game = Game.objects.create(team1=team1, team2=team2, date=game_date) #creates a game on the date found next available
-            next_game_gap = random.randint(2, 3)
-            next_available_date[team1.id] = game_date + datetime.timedelta(days=next_game_gap)
-            next_available_date[team2.id] = game_date + datetime.timedelta(days=next_game_gap)
-            game.points_scored()
-
-            #checks to see if a team won or lost on a particular day and saves the result
-            if game.points_scored_team1 > game.points_scored_team2:
-                winner, loser = team1, team2
-            else:
-                winner, loser = team2, team1
-
-            winner.wins += 1
-            loser.losses += 1
-            winner.save()
-            loser.save()
-
-            games_played[team1.id] += 1
-            games_played[team2.id] += 1
-
-        def can_schedule_game(team1, team2):
-            #checks to see if two teams are available to play on a particular day
-
-            return team1 != team2 and games_played[team1.id] < max_games and games_played[team2.id] < max_games
-
-        #ensure each team plays exactly num_games (max_games) games
-        for _ in range(max_games):
-            for team1 in teams:
-                for team2 in teams:
-                    if can_schedule_game(team1, team2):
-                        schedule_game(team1, team2)
-
-        #sorts the teams for the standings based on wins to losses
-        sorted_teams = sorted(teams, key=lambda t: (-t.wins, t.losses))
-
-        #assigns standings based on record
-        for index, team in enumerate(sorted_teams):
-            team.place_in_standings = index + 1
-            team.save()
-
-        league.update_league_stats()
-
-        #verify the number of game objects created - debugging purposes
-        total_games_created = Game.objects.filter(team1__league=league).count()
-        print(f"Total games created: {total_games_created}")
-        print(f"Number of games per team should be: {original_num_games}")
-
-        for team in teams:
-            print(f"Games played by {team.name}: {games_played[team.id]}")
-
-        messages.success(request, "League games have been simulated successfully!")
-        return HttpResponseRedirect(reverse('league_management', args=[pk]))
+        try:
+            wait = min(float(request.GET.get('wait', 0)), settings.JOB_STATUS_MAX_WAIT)
+        except ValueError:
+            wait = 0
+        deadline = time.monotonic() + wait
+        shown = (request.GET.get('status'), request.GET.get('progress'))
+
+        while (job.status, str(job.progress)) == shown and not job.is_finished() and time.monotonic() < deadline:
+            await asyncio.sleep(settings.JOB_STATUS_POLL_INTERVAL)
+            job = await jobs.afirst() or job
+
+        return JsonResponse({
+            'id': job.pk,
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'progress': job.progress,
+            'message': job.message,
+            'finished': job.is_finished(),
+            'created_at': job.created_at,
+            'started_at': job.started_at,
+            'finished_at': job.finished_at,
+        })
 
 
+class LeagueProjectionView(LoginRequiredMixin, DetailView):
+    '''projects the season by simulating it thousands of times from the current rosters'''
+
+    model = League
+    template_name = "project/league_projection.html"
+    context_object_name = "league"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
 
+        #number of simulated seasons can be picked on the page, capped so a single request stays fast
+        try:
+            trials = int(self.request.GET.get('trials', settings.PROJECTION_TRIALS))
+        except ValueError:
+            trials = settings.PROJECTION_TRIALS
+        trials = min(max(trials, 1), settings.PROJECTION_MAX_TRIALS)
+
+        try:
+            context['projections'] = project_season(self.object, trials=trials)
+        except SimulationError as error:
+            context['projections'] = []
+            messages.error(self.request, str(error))
+
+        context['trials'] = trials
+        context['places'] = range(1, self.object.team_set.count() + 1)
+        return context
 
 
 class LoggedOutView(TemplateView):
@@ -437,45 +456,107 @@ class RegisterUserView(FormView):
     
 
 
-class LeagueStatsView(LoginRequiredMixin, DetailView):
-    '''view to manage displaying stats and provides filtering support'''
+def league_games(league, team_name=''):
+    '''games of the league, optionally only the ones of teams matching team_name - both teams of every
+    game are joined in, the game log prints them for every row'''
+
+    games = Game.objects.filter(league=league).select_related('team1', 'team2')
+    if team_name:
+        games = games.filter(Q(team1__name__icontains=team_name) | Q(team2__name__icontains=team_name))
+    return games
+
+
+class LeagueStatsView(AsyncLeagueFragmentView):
+    '''view to manage displaying stats and provides filtering support - the tables are rendered once per
+    data version of the league, search and page'''
 
     model = League
     template_name = "project/league_stats.html"
+    fragment_template = "project/fragments/league_stats.html"
     context_object_name = "league"
 
-    def get_context_data(self, **kwargs):
+    def get_fragment_key_parts(self):
+        return [self.request.GET.get('team_name', ''), self.request.GET.get('after', '')]
+
+    async def aget_context_data(self, **kwargs):
         #method to handle context data
-        context = super().get_context_data(**kwargs)
-        league = self.get_object()
-        
+        context = await super().aget_context_data(**kwargs)
+        context['team_name'] = self.request.GET.get('team_name', '')
+        context['export_kinds'] = list(EXPORT_KINDS)
+        return context
+
+    async def aget_fragment_context(self, context):
+        league = self.object
         team_name = self.request.GET.get('team_name', '')
 
-        #filtering logic for teams
-        if team_name:
-            teams = Team.objects.filter(league=league, name__icontains=team_name)
-            games = Game.objects.filter(team1__in=teams) | Game.objects.filter(team2__in=teams)
-        else:
-            games = Game.objects.filter(team1__league=league).order_by('-id')
+        #the game log is shown one page at a time, the rest is loaded on demand
+        try:
+            games, next_cursor = await agames_page(league_games(league, team_name), self.request.GET.get('after'))
+        except ValueError:
+            games, next_cursor = await agames_page(league_games(league, team_name))
 
         context['games'] = games
-        context['teams'] = Team.objects.filter(league=league).order_by('place_in_standings', '-wins', 'losses')
+        context['next_cursor'] = next_cursor
         context['team_name'] = team_name
+        #the stats of every team are cached, they are only counted again after the games change
+        stats = await ateam_stats(league)
+        context['standings'] = [standing async for standing in league.standings.select_related('team').order_by('place')]
+        for standing in context['standings']:
+            standing.stats = stats.get(standing.team_id)
 
         return context
 
 
+class LeagueGamesView(LoginRequiredMixin, View):
+    '''next page of the game log, used by the load more button of the stats page - returns the rendered
+    rows and the cursor of the page after them'''
+
+    def get(self, request, pk, *args, **kwargs):
+        league = get_object_or_404(League, pk=pk)
+
+        try:
+            games, next_cursor = games_page(league_games(league, request.GET.get('team_name', '')), request.GET.get('after'))
+        except ValueError:
+            return HttpResponseBadRequest("Invalid cursor.")
+
+        return JsonResponse({
+            'html': render_to_string('project/game_rows.html', {'games': games}, request=request),
+            'next': next_cursor,
+        })
+
+
+class LeagueExportView(AsyncLoginRequiredMixin, View):
+    '''streams the games, standings or rosters of a league as a csv or ndjson download - the rows are
+    written as they come out of the db, so the whole export is never held in memory. under asgi the rows
+    are read with the async orm, under wsgi with the sync one'''
+
+    async def get(self, request, pk, kind, export_format, *args, **kwargs):
+        if kind not in EXPORT_KINDS or export_format not in EXPORT_FORMATS:
+            raise Http404("Unknown export.")
+        league = await aget_object_or_404(League, pk=pk)
+
+        #each server consumes the iterator its own way, handing it the other kind makes django buffer it
+        if isinstance(request, ASGIRequest):
+            lines = astream_export(league, kind, export_format)
+        else:
+            lines = stream_export(league, kind, export_format)
+
+        response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename="league-{league.pk}-{kind}.{export_format}"'
+        return response
+
+
     
-class LeagueTeamsView(LoginRequiredMixin, DetailView):
+class LeagueTeamsView(AsyncLeagueFragmentView):
     '''a view to see the teams in the league'''
 
     model = League
     template_name = "project/league_teams.html"
+    fragment_template = "project/fragments/league_teams.html"
     context_object_name = "league"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['teams'] = Team.objects.filter(league=self.object)
+    async def aget_fragment_context(self, context):
+        context['teams'] = [team async for team in Team.objects.filter(league=self.object)]
         return context
 
 
@@ -506,20 +587,28 @@ class PlayerDetailView(LoginRequiredMixin, DetailView):
         )
 
 
-class TeamDetailView(LoginRequiredMixin, DetailView):
+class TeamDetailView(AsyncLeagueFragmentView):
     '''a view to see information about a specific team'''
 
     model = Team
     template_name = "project/team_detail.html"
+    fragment_template = "project/fragments/team_detail.html"
+    context_object_name = "team"
 
     def get_queryset(self):
-        return Team.objects.filter(league_id=self.kwargs['league_pk'])
+        #the league is joined in for the links on the page and its data version
+        return Team.objects.select_related('league').filter(league_id=self.kwargs['league_pk'])
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['roster'] = self.object.roster()
-        context['team'] = Team.objects.get(pk=self.object.pk)
-        context['all_teams'] = Team.objects.filter(league_id=self.kwargs['league_pk']).order_by('-wins', 'losses') #acquires all teams - debugging reasons
+    def get_league(self):
+        return self.object.league
+
+    def get_fragment_key_parts(self):
+        return [self.object.pk]
+
+    async def aget_fragment_context(self, context):
+        context['roster'] = [player async for player in self.object.roster()]
+        context['stats'] = (await ateam_stats(self.object.league)).get(self.object.pk)
+        context['head_to_head'] = await ahead_to_head(self.object)
         return context
 
 
@@ -528,9 +617,17 @@ class UpdateTeamView(LoginRequiredMixin, UpdateView):
     """update a team's details"""
 
     model = Team
-    fields = ['name', 'city', 'place_in_standings', 'wins', 'losses', 'star_mult']
+    fields = ['name', 'city']  #the record and place come from the games, star_mult from the roster
     template_name = "project/update_team_form.html"
 
+    def form_valid(self, form):
+        """saves the edited fields and retires the cached pages of the league"""
+
+        with transaction.atomic():
+            self.object = save_changed_fields(form)
+            self.object.league.bump_data_version()
+        return HttpResponseRedirect(self.get_success_url())
+
     def get_success_url(self):
         """return back to the league detail page"""
 
@@ -544,6 +641,16 @@ class UpdatePlayerView(LoginRequiredMixin, UpdateView):
     fields = ['first_name', 'last_name', 'position', 'star', 'dob']
     template_name = "project/update_player_form.html"
 
+    def form_valid(self, form):
+        """saves the player and keeps the team's star count in sync when the star flag changes"""
+
+        with transaction.atomic():
+            self.object = save_changed_fields(form)
+            if 'star' in form.changed_data:
+                self.object.team.update_star_count()
+            self.object.team.league.bump_data_version()
+        return HttpResponseRedirect(self.get_success_url())
+
     def get_success_url(self):
         """return back to the team detail page"""
 